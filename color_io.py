@@ -0,0 +1,136 @@
+"""
+Lecture / écriture des fichiers de couleurs (format texte "R, G, B").
+
+La base fait plus d'un million de lignes : plutôt que de la reparser à
+chaque exécution, une copie binaire .npy est gardée à côté du fichier
+texte et relue tant qu'elle est plus récente que lui.
+
+Fournit aussi l'empaquetage R, G, B ↔ entier uint32 (0xRRGGBB), utilisé
+comme clé pour dédoublonner ou trier les couleurs sans passer par des tuples.
+"""
+
+import numpy as np
+import os
+import tempfile
+
+
+def read_colors(file_path):
+    """Charge un fichier de couleurs (format CSV: R, G, B) en tableau uint8 N×3"""
+    cache_path = os.path.splitext(file_path)[0] + ".npy"
+
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        try:
+            return np.load(cache_path)
+        except (ValueError, EOFError, OSError):
+            pass  # Copie binaire corrompue ou tronquée : relecture du texte
+
+    colors = np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+
+    try:
+        write_atomic(cache_path, lambda f: np.save(f, colors))
+    except OSError:
+        pass  # Dossier en lecture seule : pas de cache, le texte sera relu
+
+    return colors
+
+
+def write_atomic(path, write):
+    """
+    Écrit un fichier de cache via write(f) dans un fichier temporaire du même
+    dossier, puis le renomme (os.replace, atomique) : un processus concurrent
+    voit l'ancien fichier ou le nouveau complet, jamais un fichier partiel.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _decimal_table():
+    """Représentation décimale ASCII de 0..255 (alignée à gauche) et longueur"""
+    digits = np.zeros((256, 3), dtype=np.uint8)
+    lengths = np.zeros(256, dtype=np.intp)
+    for value in range(256):
+        text = str(value).encode()
+        digits[value, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+        lengths[value] = len(text)
+    return digits, lengths
+
+
+def write_colors(colors, file_path):
+    """
+    Écrit les couleurs au format texte "R, G, B" (une ligne par couleur).
+
+    Le texte est assemblé en un seul buffer par NumPy : chaque ligne occupe
+    une grille de 3×5 octets (3 chiffres + séparateur par canal) dont on ne
+    garde que les octets utiles, au lieu d'un f-string par couleur.
+    """
+    colors = np.asarray(colors, dtype=np.uint8)
+    n = len(colors)
+    digits, lengths = _decimal_table()
+
+    cells = np.empty((n, 3, 5), dtype=np.uint8)
+    cells[:, :, :3] = digits[colors]
+    cells[:, :, 3:] = np.frombuffer(b", ", dtype=np.uint8)
+    cells[:, 2, 3] = ord("\n")
+
+    used = np.empty((n, 3, 5), dtype=bool)
+    used[:, :, :3] = np.arange(3) < lengths[colors][:, :, None]
+    used[:, :, 3:] = True
+    used[:, 2, 4] = False
+
+    with open(file_path, 'wb') as f:
+        f.write(b"# R, G, B\n")
+        f.write(cells[used].tobytes())
+
+
+def pack_rgb(colors):
+    """Empaquette un tableau N×3 uint8 en clés uint32 0xRRGGBB"""
+    colors = np.asarray(colors)
+    return ((colors[:, 0].astype(np.uint32) << 16) |
+            (colors[:, 1].astype(np.uint32) << 8) |
+            colors[:, 2].astype(np.uint32))
+
+
+def unpack_rgb(keys):
+    """Inverse de pack_rgb : clés uint32 0xRRGGBB → tableau N×3 uint8"""
+    keys = np.asarray(keys, dtype=np.uint32)
+    colors = np.empty((len(keys), 3), dtype=np.uint8)
+    colors[:, 0] = keys >> 16
+    colors[:, 1] = keys >> 8
+    colors[:, 2] = keys
+    return colors
+
+
+def reduced_unique_indices(colors):
+    """
+    Indices de la première occurrence de chaque couleur après la réduction
+    (x // 2) * 2, dans l'ordre des couleurs réduites : même résultat que
+    np.unique((colors // 2) * 2, axis=0, return_index=True)[1].
+    """
+    colors = np.asarray(colors)
+
+    # Réduction = 7 bits utiles par canal : clé sur 21 bits, et une table
+    # de 2^21 entrées remplace le tri de np.unique (~3× plus rapide).
+    # Clé assemblée sur place, sans matérialiser les couleurs réduites ni
+    # un temporaire par canal
+    keys = (colors[:, 0] >> 1).astype(np.int32)
+    keys <<= 7
+    keys |= colors[:, 1] >> 1
+    keys <<= 7
+    keys |= colors[:, 2] >> 1
+
+    # Plus petit indice par clé = première occurrence. np.minimum.at est
+    # défini pour les clés répétées, contrairement à une affectation
+    # dispersée dont la dernière écriture n'est pas garantie par NumPy.
+    # Table et indices en int32 (bases < 2^31 couleurs) : 8 Mo au lieu de
+    # 16 Mo parcourus au hasard par l'écriture dispersée
+    absent = np.iinfo(np.int32).max
+    first_index = np.full(1 << 21, absent, dtype=np.int32)
+    np.minimum.at(first_index, keys, np.arange(len(keys), dtype=np.int32))
+
+    return first_index[first_index != absent]
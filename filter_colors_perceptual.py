@@ -12,14 +12,18 @@ Le but : garder un maximum de couleurs distinctes pour l'œil humain,
 tout en éliminant celles qui seraient des doublons à l'impression.
 """
 
+import math
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image, ImageCms
+from scipy.spatial import cKDTree
 from colormath.color_objects import sRGBColor, LabColor
 from colormath.color_conversions import convert_color
 from colormath.color_diff import delta_e_cie2000
 import os
 import sys
-from collections import defaultdict
+
+from color_io import read_colors, write_colors
 
 # Configuration
 INPUT_FILE = "COULEURS_EPSON_UNIQUE_1.6M.txt"
@@ -36,26 +40,42 @@ DELTA_E_THRESHOLDS = {
     'very_saturated': 1.5  # Couleurs très saturées
 }
 
+# Ordre des codes de région renvoyés par classify_color_regions
+REGION_NAMES = ['neutral', 'pastel', 'dark', 'saturated', 'very_saturated']
+
+# Seuil Delta E indexé par code de région : THRESH_LUT[region_code]
+THRESH_LUT = np.array([DELTA_E_THRESHOLDS[r] for r in REGION_NAMES], dtype=np.float32)
+
 
 def load_colors(file_path):
     """Charge le fichier de couleurs"""
     print(f"Chargement de {file_path}...")
-    colors = np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+    colors = read_colors(file_path)
     print(f"  → {len(colors):,} couleurs chargées")
     return colors
 
 
-def rgb_to_lab_batch(rgb_colors):
-    """Convertit un tableau RGB en LAB de manière optimisée"""
-    print("Conversion RGB → CIELAB...")
+# Correction gamma sRGB inverse (sRGB 8 bits → linéaire), tabulée pour les
+# 256 valeurs possibles : évite la puissance 2.4 par canal et par couleur
+_levels = np.arange(256) / 255.0
+SRGB_TO_LINEAR = np.where(_levels <= 0.04045,
+                          _levels / 12.92,
+                          ((_levels + 0.055) / 1.055) ** 2.4)
+
 
-    # Normaliser RGB [0-255] → [0-1]
-    rgb_norm = rgb_colors.astype(np.float64) / 255.0
+def rgb_to_lab_batch(rgb_colors, block_size=262144):
+    """
+    Convertit un tableau RGB en LAB de manière optimisée.
+    Le calcul est fait par blocs : les tableaux intermédiaires restent
+    petits au lieu de matérialiser plusieurs copies N×3 en float64.
 
-    # Conversion sRGB → XYZ (avec gamma)
-    # Appliquer la correction gamma sRGB
-    mask = rgb_norm <= 0.04045
-    rgb_linear = np.where(mask, rgb_norm / 12.92, ((rgb_norm + 0.055) / 1.055) ** 2.4)
+    Le résultat est stocké en float32 : la précision (~1e-5 sur L, a, b)
+    est largement suffisante pour des seuils Delta E de l'ordre de 0.5,
+    et divise par deux la mémoire parcourue par la recherche de voisins.
+    """
+    print("Conversion RGB → CIELAB...")
+    n = len(rgb_colors)
+    lab = np.empty((n, 3), dtype=np.float32)
 
     # Matrice de conversion sRGB → XYZ (illuminant D65)
     M = np.array([
@@ -64,102 +84,121 @@ def rgb_to_lab_batch(rgb_colors):
         [0.0193339, 0.1191920, 0.9503041]
     ])
 
-    xyz = np.dot(rgb_linear, M.T)
-
-    # Référence blanc D65
+    # Référence blanc D65, intégrée directement dans la matrice
     xyz_ref = np.array([0.95047, 1.00000, 1.08883])
-    xyz_norm = xyz / xyz_ref
+    M_norm_T = (M / xyz_ref[:, None]).T
 
     # Conversion XYZ → LAB
     epsilon = 0.008856
     kappa = 903.3
 
-    f = np.where(xyz_norm > epsilon,
-                 np.cbrt(xyz_norm),
-                 (kappa * xyz_norm + 16) / 116)
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
 
-    L = 116 * f[:, 1] - 16
-    a = 500 * (f[:, 0] - f[:, 1])
-    b = 200 * (f[:, 1] - f[:, 2])
+        # Correction gamma sRGB par simple lecture de table
+        rgb_linear = SRGB_TO_LINEAR[rgb_colors[start:end]]
+
+        # sRGB linéaire → XYZ normalisé par le blanc de référence
+        xyz_norm = rgb_linear @ M_norm_T
+
+        f = np.where(xyz_norm > epsilon,
+                     np.cbrt(xyz_norm),
+                     (kappa * xyz_norm + 16) / 116)
+
+        block = lab[start:end]
+        block[:, 0] = 116 * f[:, 1] - 16
+        block[:, 1] = 500 * (f[:, 0] - f[:, 1])
+        block[:, 2] = 200 * (f[:, 1] - f[:, 2])
 
-    lab = np.column_stack([L, a, b])
     print(f"  → Conversion terminée")
     return lab
 
 
-def classify_color_region(L, C):
+def classify_color_regions(L, C):
     """
-    Classifie une couleur selon sa région perceptuelle.
+    Classifie chaque couleur selon sa région perceptuelle (vectorisé).
     L = Luminosité (0-100)
     C = Chroma (saturation) = sqrt(a² + b²)
+    Retourne un code de région par couleur, indice dans REGION_NAMES.
     """
-    if C < 10:  # Très désaturé
-        if L > 90:
-            return 'neutral'  # Blanc/gris clair
-        elif L < 20:
-            return 'neutral'  # Noir/gris foncé
-        else:
-            return 'neutral'  # Gris moyen
-    elif C < 30:  # Peu saturé
-        if L > 70:
-            return 'pastel'
-        elif L < 30:
-            return 'dark'
-        else:
-            return 'pastel'
-    elif C < 60:  # Moyennement saturé
-        if L < 30:
-            return 'dark'
-        else:
-            return 'saturated'
-    else:  # Très saturé
-        return 'very_saturated'
+    region_code = np.empty(len(L), dtype=np.int8)
+
+    # Très désaturé : gris, blancs, noirs
+    region_code[C < 10] = 0  # neutral
+
+    # Peu saturé : pastel, sauf les sombres
+    low = (C >= 10) & (C < 30)
+    region_code[low] = 1  # pastel
+    region_code[low & (L < 30)] = 2  # dark
+
+    # Moyennement saturé : saturé, sauf les sombres
+    mid = (C >= 30) & (C < 60)
+    region_code[mid] = 3  # saturated
+    region_code[mid & (L < 30)] = 2  # dark
+
+    # Très saturé
+    region_code[C >= 60] = 4  # very_saturated
+
+    return region_code
+
+
+# Tables des termes de Delta E 2000 qui ne dépendent que de la teinte moyenne h',
+# échantillonnées tous les 0.5° : remplacent 4 cosinus, une exponentielle et un sinus
+# par une simple lecture de table (erreur < 0.01 sur T, négligeable sur le Delta E)
+HUE_LUT_STEP = 0.5
+HUE_LUT_SIZE = int(360 / HUE_LUT_STEP)
+_hue_grid = np.radians(np.arange(HUE_LUT_SIZE) * HUE_LUT_STEP)
+T_TABLE = (1 - 0.17 * np.cos(_hue_grid - math.radians(30)) +
+           0.24 * np.cos(2 * _hue_grid) +
+           0.32 * np.cos(3 * _hue_grid + math.radians(6)) -
+           0.20 * np.cos(4 * _hue_grid - math.radians(63))).astype(np.float32)
+# sin(2·Δθ) avec Δθ = 30·exp(-((h' - 275) / 25)²), utilisé pour RT
+RT_SIN_TABLE = np.sin(np.radians(2 * 30 * np.exp(-((np.degrees(_hue_grid) - 275) / 25)**2))).astype(np.float32)
 
 
 def delta_e_2000_vectorized(lab1, lab2):
     """
     Calcul Delta E 2000 vectorisé pour de meilleures performances.
     Basé sur la formule CIEDE2000.
+
+    Les sous-expressions communes ne sont calculées qu'une fois et les
+    sélections par masque sont remplacées par np.where, pour limiter le
+    nombre de tableaux temporaires alloués à chaque appel.
+
+    lab1 peut être une seule couleur de référence (forme (3,)) : elle est
+    alors diffusée (broadcasting) sur toutes les couleurs de lab2, sans copie.
     """
-    L1, a1, b1 = lab1[:, 0], lab1[:, 1], lab1[:, 2]
-    L2, a2, b2 = lab2[:, 0], lab2[:, 1], lab2[:, 2]
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
 
     # Constantes de pondération
     kL, kC, kH = 1.0, 1.0, 1.0
 
-    # Calcul des chromas
-    C1 = np.sqrt(a1**2 + b1**2)
-    C2 = np.sqrt(a2**2 + b2**2)
-    C_avg = (C1 + C2) / 2
-
-    # G factor
-    G = 0.5 * (1 - np.sqrt(C_avg**7 / (C_avg**7 + 25**7)))
+    # Chroma moyen et G factor
+    C_avg = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    C_avg7 = C_avg**7
+    G = 0.5 * (1 - np.sqrt(C_avg7 / (C_avg7 + 25**7)))
 
     # a' (a prime)
     a1_prime = a1 * (1 + G)
     a2_prime = a2 * (1 + G)
 
     # C' (chroma prime)
-    C1_prime = np.sqrt(a1_prime**2 + b1**2)
-    C2_prime = np.sqrt(a2_prime**2 + b2**2)
+    C1_prime = np.hypot(a1_prime, b1)
+    C2_prime = np.hypot(a2_prime, b2)
 
     # h' (hue prime)
     h1_prime = np.degrees(np.arctan2(b1, a1_prime)) % 360
     h2_prime = np.degrees(np.arctan2(b2, a2_prime)) % 360
 
-    # Delta L', C', H'
+    # Delta L', C'
     delta_L_prime = L2 - L1
     delta_C_prime = C2_prime - C1_prime
 
-    # Delta h'
-    delta_h_prime = np.zeros_like(h1_prime)
-    mask1 = np.abs(h2_prime - h1_prime) <= 180
-    mask2 = (h2_prime - h1_prime) > 180
-    mask3 = (h2_prime - h1_prime) < -180
-
-    delta_h_prime[mask1] = h2_prime[mask1] - h1_prime[mask1]
-    delta_h_prime[mask2] = h2_prime[mask2] - h1_prime[mask2] - 360
-    delta_h_prime[mask3] = h2_prime[mask3] - h1_prime[mask3] + 360
+    # Delta h' ramené dans [-180, 180]
+    dh = h2_prime - h1_prime
+    close_hues = np.abs(dh) <= 180
+    delta_h_prime = np.where(close_hues, dh, np.where(dh > 180, dh - 360, dh + 360))
 
     # Delta H'
     delta_H_prime = 2 * np.sqrt(C1_prime * C2_prime) * np.sin(np.radians(delta_h_prime / 2))
@@ -169,42 +208,41 @@ def delta_e_2000_vectorized(lab1, lab2):
     C_avg_prime = (C1_prime + C2_prime) / 2
 
     # h_avg'
-    h_avg_prime = np.zeros_like(h1_prime)
-    mask_sum = np.abs(h1_prime - h2_prime) <= 180
-    h_avg_prime[mask_sum] = (h1_prime[mask_sum] + h2_prime[mask_sum]) / 2
-    h_avg_prime[~mask_sum] = (h1_prime[~mask_sum] + h2_prime[~mask_sum] + 360) / 2
+    h_sum = h1_prime + h2_prime
+    h_avg_prime = np.where(close_hues, h_sum, h_sum + 360) / 2
+
+    # Indice de h_avg' dans les tables de teinte (arrondi au 0.5° le plus proche,
+    # h_avg' peut dépasser 360° pour des teintes opposées : modulo)
+    hue_idx = (h_avg_prime * (1 / HUE_LUT_STEP) + 0.5).astype(np.intp) % HUE_LUT_SIZE
 
     # T
-    T = (1 - 0.17 * np.cos(np.radians(h_avg_prime - 30)) +
-         0.24 * np.cos(np.radians(2 * h_avg_prime)) +
-         0.32 * np.cos(np.radians(3 * h_avg_prime + 6)) -
-         0.20 * np.cos(np.radians(4 * h_avg_prime - 63)))
+    T = T_TABLE[hue_idx]
 
     # SL, SC, SH
-    SL = 1 + (0.015 * (L_avg - 50)**2) / np.sqrt(20 + (L_avg - 50)**2)
+    L_avg_50_sq = (L_avg - 50)**2
+    SL = 1 + (0.015 * L_avg_50_sq) / np.sqrt(20 + L_avg_50_sq)
     SC = 1 + 0.045 * C_avg_prime
     SH = 1 + 0.015 * C_avg_prime * T
 
     # RT
-    delta_theta = 30 * np.exp(-((h_avg_prime - 275) / 25)**2)
-    RC = 2 * np.sqrt(C_avg_prime**7 / (C_avg_prime**7 + 25**7))
-    RT = -RC * np.sin(np.radians(2 * delta_theta))
+    C_avg_prime7 = C_avg_prime**7
+    RC = 2 * np.sqrt(C_avg_prime7 / (C_avg_prime7 + 25**7))
+    RT = -RC * RT_SIN_TABLE[hue_idx]
 
     # Delta E 2000
-    delta_E = np.sqrt(
-        (delta_L_prime / (kL * SL))**2 +
-        (delta_C_prime / (kC * SC))**2 +
-        (delta_H_prime / (kH * SH))**2 +
-        RT * (delta_C_prime / (kC * SC)) * (delta_H_prime / (kH * SH))
-    )
+    dL = delta_L_prime / (kL * SL)
+    dC = delta_C_prime / (kC * SC)
+    dH = delta_H_prime / (kH * SH)
 
-    return delta_E
+    return np.sqrt(dL**2 + dC**2 + dH**2 + RT * dC * dH)
 
 
-def filter_perceptual_duplicates_adaptive(rgb_colors, lab_colors, batch_size=50000):
+def filter_perceptual_duplicates_adaptive(rgb_colors, lab_colors, batch_size=20000):
     """
     Filtre les doublons perceptuels avec des seuils adaptatifs.
-    Utilise une grille LAB pour accélérer la recherche de voisins.
+    Utilise un arbre k-d sur LAB pour accélérer la recherche de voisins.
+    Les paires de doublons sont calculées en bloc (batch_size couleurs à la
+    fois), seule la sélection finale reste une boucle séquentielle.
     """
     n = len(rgb_colors)
     print(f"\nFiltrage perceptuel adaptatif de {n:,} couleurs...")
@@ -217,97 +255,100 @@ def filter_perceptual_duplicates_adaptive(rgb_colors, lab_colors, batch_size=500
 
     # Classifier chaque couleur
     print("Classification des régions colorimétriques...")
-    regions = np.array([classify_color_region(L[i], C[i]) for i in range(n)])
+    region_code = classify_color_regions(L, C)
+    thresholds = THRESH_LUT[region_code]
 
     # Statistiques par région
-    region_counts = defaultdict(int)
-    for r in regions:
-        region_counts[r] += 1
+    region_counts = np.bincount(region_code, minlength=len(REGION_NAMES))
     print("Distribution par région:")
-    for region, count in sorted(region_counts.items()):
+    for region, count in sorted(zip(REGION_NAMES, region_counts)):
+        if count == 0:
+            continue
         threshold = DELTA_E_THRESHOLDS[region]
         print(f"  {region:15s}: {count:>10,} couleurs (ΔE seuil: {threshold})")
 
-    # Créer une grille 3D pour accélérer la recherche
-    # Taille de cellule basée sur le plus petit seuil
-    min_threshold = min(DELTA_E_THRESHOLDS.values())
-    cell_size = min_threshold * 2  # En unités LAB
-
-    print(f"\nCréation de la grille spatiale (cellule: {cell_size:.1f} LAB)...")
-
-    # Normaliser LAB pour la grille
-    L_min, L_max = 0, 100
-    ab_min, ab_max = -128, 128
-
-    grid = defaultdict(list)
-    for i in range(n):
-        # Calculer les indices de grille
-        gl = int((L[i] - L_min) / cell_size)
-        ga = int((a[i] - ab_min) / cell_size)
-        gb = int((b[i] - ab_min) / cell_size)
-        grid[(gl, ga, gb)].append(i)
-
-    print(f"  → {len(grid):,} cellules occupées")
-
+    # Arbre k-d sur les coordonnées LAB pour la recherche de voisins
+    # Rayon = 2 × plus grand seuil : Delta E 2000 atténue les écarts de chroma
+    # des couleurs saturées, un doublon peut donc être plus loin que le seuil
+    # en distance LAB euclidienne. Le seuil de chaque région est appliqué ensuite.
+    search_radius = 2 * max(DELTA_E_THRESHOLDS.values())  # En unités LAB
+
+    print(f"\nConstruction de l'arbre k-d (rayon de recherche: {search_radius:.1f} LAB)...")
+    tree = cKDTree(lab_colors)
+
+    # Rayon du pré-filtre euclidien par couleur : 2 × seuil, multiplié par
+    # SC = 1 + 0.045·C car Delta E 2000 divise l'écart de chroma par SC
+    prefilter_radius = thresholds * 2 * (1 + 0.045 * C)
+
+    # 1) Construction en bloc des arêtes "doublon" : j est un doublon de i si
+    #    Delta E 2000(i, j) < seuil de i. Traitement par paquets de couleurs :
+    #    sparse_distance_matrix entre l'arbre du paquet et l'arbre complet
+    #    renvoie directement les paires (i, j, distance) en tableau, sans
+    #    liste Python de voisins par couleur à aplatir.
+    print("Recherche des paires de doublons...")
+    edge_src = []
+    edge_dst = []
+    for start in range(0, n, batch_size):
+        end = min(start + batch_size, n)
+        batch_tree = cKDTree(lab_colors[start:end])
+        pairs = batch_tree.sparse_distance_matrix(tree, search_radius, output_type='ndarray')
+        src = pairs['i'] + start
+        dst = pairs['j']
+
+        # Pré-filtre euclidien (distance déjà calculée par l'arbre) : au-delà
+        # de ce rayon en distance LAB, inutile de calculer le Delta E 2000
+        close = (pairs['v'] < prefilter_radius[src]) & (src != dst)
+        src, dst = src[close], dst[close]
+
+        delta_e = delta_e_2000_vectorized(lab_colors[src], lab_colors[dst])
+        duplicate = delta_e < thresholds[src]
+        edge_src.append(src[duplicate])
+        edge_dst.append(dst[duplicate])
+
+        if end % (batch_size * 10) == 0 or end == n:
+            print(f"  Couleurs analysées: {end:,}/{n:,}")
+
+    edge_src = np.concatenate(edge_src)
+    edge_dst = np.concatenate(edge_dst)
+    print(f"  → {len(edge_src):,} paires de doublons")
+
+    # Liste d'adjacence compacte (CSR) : doublons de i = adj[ptr[i]:ptr[i+1]]
+    order = np.argsort(edge_src, kind='stable')
+    adj = edge_dst[order]
+    ptr = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(edge_src, minlength=n), out=ptr[1:])
+
+    # 2) Sélection gloutonne : du plus clair au plus sombre, chaque couleur
+    #    encore gardée élimine ses doublons. Même résultat que le parcours
+    #    séquentiel d'origine ; pas de composantes connexes, qui fusionneraient
+    #    par transitivité des couleurs bien distinctes.
     # Marquer les couleurs à garder
     keep = np.ones(n, dtype=bool)
 
     print("Élimination des doublons perceptuels...")
     processed = 0
-    removed = 0
 
     # Trier par luminosité pour traiter les couleurs claires en premier (plus sensibles)
     sorted_indices = np.argsort(-L)  # Du plus clair au plus sombre
 
-    for idx in sorted_indices:
-        if not keep[idx]:
-            continue
-
-        i = idx
-        region = regions[i]
-        threshold = DELTA_E_THRESHOLDS[region]
+    # Seules les couleurs qui ont au moins un doublon peuvent en éliminer :
+    # les autres sont gardées sans passer par la boucle
+    has_duplicates = ptr[1:] > ptr[:-1]
+    candidates = sorted_indices[has_duplicates[sorted_indices]]
+    num_candidates = len(candidates)
 
-        # Cellule de cette couleur
-        gl = int((L[i] - L_min) / cell_size)
-        ga = int((a[i] - ab_min) / cell_size)
-        gb = int((b[i] - ab_min) / cell_size)
-
-        # Vérifier les cellules voisines
-        neighbors = []
-        for dl in range(-2, 3):
-            for da in range(-2, 3):
-                for db in range(-2, 3):
-                    cell_key = (gl + dl, ga + da, gb + db)
-                    if cell_key in grid:
-                        neighbors.extend(grid[cell_key])
-
-        # Filtrer les voisins trop proches
-        if len(neighbors) > 1:
-            neighbors = np.array([j for j in neighbors if j != i and keep[j]])
-
-            if len(neighbors) > 0:
-                # Calculer Delta E 2000 avec tous les voisins
-                lab_i = lab_colors[i:i+1]
-                lab_neighbors = lab_colors[neighbors]
-
-                # Répéter lab_i pour le calcul vectorisé
-                lab_i_repeated = np.repeat(lab_i, len(neighbors), axis=0)
-
-                delta_e = delta_e_2000_vectorized(lab_i_repeated, lab_neighbors)
-
-                # Marquer les voisins trop proches comme doublons
-                for j, de in zip(neighbors, delta_e):
-                    if de < threshold and keep[j]:
-                        # Garder la couleur la plus claire (i est traitée en premier si plus claire)
-                        keep[j] = False
-                        removed += 1
+    for i in candidates:
+        if keep[i]:
+            # Garder la couleur la plus claire (i est traitée en premier si plus claire)
+            keep[adj[ptr[i]:ptr[i + 1]]] = False
 
         processed += 1
         if processed % 100000 == 0:
             kept = np.sum(keep)
-            print(f"  Traité: {processed:,}/{n:,} | Gardées: {kept:,} | Supprimées: {removed:,}")
+            print(f"  Traité: {processed:,}/{num_candidates:,} | Gardées: {kept:,} | Supprimées: {n - kept:,}")
 
     kept_count = np.sum(keep)
+    removed = n - kept_count
     print(f"\n  → {kept_count:,} couleurs conservées ({removed:,} doublons supprimés)")
 
     return rgb_colors[keep], lab_colors[keep]
@@ -330,25 +371,29 @@ def check_gamut(rgb_colors, srgb_profile, printer_profile, tolerance=2):
     in_gamut_mask = np.zeros(n, dtype=bool)
     batch_size = 10000
 
-    for start in range(0, n, batch_size):
+    def process_batch(start):
+        """Marque dans in_gamut_mask les couleurs du lot qui reviennent à ± tolerance"""
         end = min(start + batch_size, n)
-        batch = rgb_colors[start:end]
+        batch = np.ascontiguousarray(rgb_colors[start:end], dtype=np.uint8)
 
-        img = Image.new('RGB', (len(batch), 1))
-        img.putdata([tuple(c) for c in batch])
+        # Image 1 ligne construite directement depuis le buffer NumPy
+        img = Image.fromarray(batch.reshape(1, -1, 3))
 
         img_printer = ImageCms.applyTransform(img, transform_to_printer)
         img_back = ImageCms.applyTransform(img_printer, transform_to_srgb)
 
-        original = np.array(list(img.getdata()), dtype=np.int16)
-        roundtrip = np.array(list(img_back.getdata()), dtype=np.int16)
+        original = batch.astype(np.int16)
+        roundtrip = np.asarray(img_back).reshape(-1, 3).astype(np.int16)
 
         max_diff = np.max(np.abs(original - roundtrip), axis=1)
         in_gamut_mask[start:end] = max_diff <= tolerance
+        return end
 
-        if (end % 100000 == 0) or end == n:
-            in_gamut = np.sum(in_gamut_mask[:end])
-            print(f"  {end:,}/{n:,} | In gamut: {in_gamut:,} ({in_gamut/end*100:.1f}%)")
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for end in executor.map(process_batch, range(0, n, batch_size)):
+            if (end % 100000 == 0) or end == n:
+                in_gamut = np.sum(in_gamut_mask[:end])
+                print(f"  {end:,}/{n:,} | In gamut: {in_gamut:,} ({in_gamut/end*100:.1f}%)")
 
     return in_gamut_mask
 
@@ -356,10 +401,7 @@ def check_gamut(rgb_colors, srgb_profile, printer_profile, tolerance=2):
 def save_colors(colors, file_path):
     """Sauvegarde les couleurs"""
     print(f"\nSauvegarde de {len(colors):,} couleurs dans {file_path}...")
-    with open(file_path, 'w') as f:
-        f.write("# R, G, B\n")
-        for r, g, b in colors:
-            f.write(f"{r}, {g}, {b}\n")
+    write_colors(colors, file_path)
     print(f"  → Fichier sauvegardé ({os.path.getsize(file_path) / 1024 / 1024:.1f} MB)")
 
 
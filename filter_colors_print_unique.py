@@ -14,10 +14,13 @@ Avantages :
 """
 
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageCms
 import os
 import sys
 
+from color_io import read_colors, write_colors, pack_rgb, unpack_rgb
+
 # Configuration
 INPUT_FILE = "COULEURS_EPSON_UNIQUE_1.6M.txt"
 OUTPUT_FILE = "COULEURS_EPSON_P9000_UNIQUE.txt"
@@ -27,7 +30,7 @@ ICC_PROFILE = "icc_profiles/2023 Epson SureColor P9000 MOAB Profiles/MOAB Lasal
 def load_colors(file_path):
     """Charge le fichier de couleurs"""
     print(f"Chargement de {file_path}...")
-    colors = np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+    colors = read_colors(file_path)
     print(f"  → {len(colors):,} couleurs chargées")
     return colors
 
@@ -56,23 +59,26 @@ def convert_through_printer(rgb_colors, srgb_profile, printer_profile, batch_siz
     # Tableau pour stocker les couleurs converties
     printed_colors = np.zeros_like(rgb_colors)
 
-    for start in range(0, n, batch_size):
+    def process_batch(start):
+        """Écrit dans printed_colors les couleurs du lot après passage par l'imprimante"""
         end = min(start + batch_size, n)
-        batch = rgb_colors[start:end]
+        batch = np.ascontiguousarray(rgb_colors[start:end], dtype=np.uint8)
 
-        # Créer une image avec les couleurs du batch
-        img = Image.new('RGB', (len(batch), 1))
-        img.putdata([tuple(c) for c in batch])
+        # Créer une image 1 ligne directement depuis le buffer du batch
+        img = Image.fromarray(batch.reshape(1, -1, 3))
 
         # Round-trip: sRGB → Printer → sRGB
         img_printer = ImageCms.applyTransform(img, transform_to_printer)
         img_back = ImageCms.applyTransform(img_printer, transform_to_srgb)
 
         # Récupérer les couleurs converties
-        printed_colors[start:end] = np.array(list(img_back.getdata()), dtype=np.uint8)
+        printed_colors[start:end] = np.asarray(img_back).reshape(-1, 3)
+        return end
 
-        if (end % 500000 == 0) or end == n:
-            print(f"  {end:,}/{n:,} ({end/n*100:.1f}%)")
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for end in executor.map(process_batch, range(0, n, batch_size)):
+            if (end % 500000 == 0) or end == n:
+                print(f"  {end:,}/{n:,} ({end/n*100:.1f}%)")
 
     return printed_colors
 
@@ -88,50 +94,36 @@ def deduplicate_by_printed_value(original_colors, printed_colors):
     n = len(original_colors)
     print(f"\nDédoublonnage par valeur imprimée unique...")
 
-    # Convertir les couleurs imprimées en tuples pour le hashing
-    printed_tuples = [tuple(c) for c in printed_colors]
+    # Clé entière par valeur imprimée : R, G, B empaquetés dans un uint32
+    printed_keys = pack_rgb(printed_colors)
+
+    # Distance au carré entre chaque original et sa valeur imprimée
+    # (au plus 3 × 255² < 2^18)
+    diff = original_colors.astype(np.int32) - printed_colors.astype(np.int32)
+    dists = np.einsum('ij,ij->i', diff, diff)
 
-    # Dictionnaire : valeur_imprimée → liste des indices originaux
+    # Un seul tri sur une clé composite (valeur imprimée, distance) : les
+    # groupes deviennent des tranches contiguës, triées par distance. Tri
+    # stable : à distance égale, le premier indice original gagne.
     print("  Groupement par valeur imprimée...")
-    groups = {}
-    for i, pt in enumerate(printed_tuples):
-        if pt not in groups:
-            groups[pt] = []
-        groups[pt].append(i)
+    sort_keys = (printed_keys.astype(np.uint64) << 18) | dists.astype(np.uint64)
+    order = np.argsort(sort_keys, kind='stable')
+    keys_sorted = printed_keys[order]
+    group_starts = np.concatenate(([0], np.flatnonzero(np.diff(keys_sorted)) + 1))
+    group_sizes = np.diff(np.append(group_starts, n))
 
-    num_unique_printed = len(groups)
+    num_unique_printed = len(group_sizes)
     print(f"  → {num_unique_printed:,} valeurs imprimées uniques")
 
-    # Pour chaque groupe, garder la couleur originale la plus proche de la valeur imprimée
+    # Pour chaque groupe, garder la couleur originale la plus proche de la
+    # valeur imprimée : c'est la première de sa tranche
     print("  Sélection des représentants optimaux...")
-    selected_indices = []
-
-    for printed_value, indices in groups.items():
-        if len(indices) == 1:
-            # Une seule couleur originale pour cette valeur imprimée
-            selected_indices.append(indices[0])
-        else:
-            # Plusieurs couleurs s'impriment pareil
-            # Garder celle dont l'original est le plus proche du résultat imprimé
-            printed_arr = np.array(printed_value, dtype=np.float32)
-            min_dist = float('inf')
-            best_idx = indices[0]
-
-            for idx in indices:
-                original = original_colors[idx].astype(np.float32)
-                dist = np.sum((original - printed_arr) ** 2)
-                if dist < min_dist:
-                    min_dist = dist
-                    best_idx = idx
-
-            selected_indices.append(best_idx)
-
-    selected_indices = np.array(sorted(selected_indices))
+    selected_indices = np.sort(order[group_starts])
 
     # Statistiques sur les doublons
     duplicates_removed = n - len(selected_indices)
-    max_group_size = max(len(g) for g in groups.values())
-    groups_with_duplicates = sum(1 for g in groups.values() if len(g) > 1)
+    max_group_size = group_sizes.max()
+    groups_with_duplicates = np.count_nonzero(group_sizes > 1)
 
     print(f"\n  Statistiques:")
     print(f"    Couleurs originales:      {n:,}")
@@ -150,11 +142,12 @@ def analyze_results(original, printed):
     diff = np.abs(original.astype(np.int16) - printed.astype(np.int16))
     max_diff_per_color = np.max(diff, axis=1)
 
-    # Distribution des écarts
-    exact_match = np.sum(max_diff_per_color == 0)
-    small_diff = np.sum((max_diff_per_color > 0) & (max_diff_per_color <= 2))
-    medium_diff = np.sum((max_diff_per_color > 2) & (max_diff_per_color <= 5))
-    large_diff = np.sum(max_diff_per_color > 5)
+    # Distribution des écarts : un seul histogramme (écarts > 5 regroupés dans la case 6)
+    bins = np.bincount(np.minimum(max_diff_per_color, 6), minlength=7)
+    exact_match = bins[0]
+    small_diff = bins[1:3].sum()
+    medium_diff = bins[3:6].sum()
+    large_diff = bins[6]
 
     print(f"  Écart = 0 (identique):     {exact_match:>10,} ({exact_match/len(original)*100:.1f}%)")
     print(f"  Écart 1-2 RGB:             {small_diff:>10,} ({small_diff/len(original)*100:.1f}%)")
@@ -167,10 +160,7 @@ def analyze_results(original, printed):
 def save_colors(colors, file_path):
     """Sauvegarde les couleurs"""
     print(f"\nSauvegarde de {len(colors):,} couleurs dans {file_path}...")
-    with open(file_path, 'w') as f:
-        f.write("# R, G, B\n")
-        for r, g, b in colors:
-            f.write(f"{r}, {g}, {b}\n")
+    write_colors(colors, file_path)
     size_mb = os.path.getsize(file_path) / 1024 / 1024
     print(f"  → Fichier sauvegardé ({size_mb:.1f} MB)")
 
@@ -202,8 +192,14 @@ def main():
     srgb_profile = ImageCms.createProfile('sRGB')
     printer_profile = ImageCms.getOpenProfile(icc_path)
 
-    # Convertir via l'imprimante (simuler l'impression)
-    printed_colors = convert_through_printer(original_colors, srgb_profile, printer_profile)
+    # Convertir via l'imprimante (simuler l'impression), une seule fois par
+    # couleur distincte : le résultat est ensuite redistribué sur toutes les entrées
+    distinct_keys, inverse = np.unique(pack_rgb(original_colors), return_inverse=True)
+    if len(distinct_keys) < initial_count:
+        print(f"\n{initial_count - len(distinct_keys):,} couleurs en double dans l'entrée : "
+              f"conversion de {len(distinct_keys):,} couleurs distinctes")
+    printed_distinct = convert_through_printer(unpack_rgb(distinct_keys), srgb_profile, printer_profile)
+    printed_colors = printed_distinct[inverse]
 
     # Dédoublonner par valeur imprimée
     unique_original, unique_printed = deduplicate_by_printed_value(original_colors, printed_colors)
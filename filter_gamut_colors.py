@@ -8,11 +8,16 @@ Utilise un profil ICC Epson P9000 pour vérifier le gamut.
 """
 
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageCms
 import os
 import sys
+import threading
 from io import BytesIO
 
+from color_io import read_colors, write_colors, pack_rgb
+from hsv import rgb_to_hsv
+
 # Configuration
 INPUT_FILE = "COULEURS_EPSON_UNIQUE_1.6M.txt"
 OUTPUT_FILE = "COULEURS_EPSON_P9000_GAMUT.txt"
@@ -24,17 +29,22 @@ ICC_PROFILE = "icc_profiles/2023 Epson SureColor P9000 MOAB Profiles/MOAB Entrad
 def load_colors(file_path):
     """Charge le fichier de couleurs"""
     print(f"Chargement de {file_path}...")
-    colors = np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+    colors = read_colors(file_path)
     print(f"  → {len(colors):,} couleurs chargées")
     return colors
 
 
-def check_gamut_batch(rgb_colors, srgb_profile, printer_profile, batch_size=10000):
+def check_gamut_batch(rgb_colors, srgb_profile, printer_profile, batch_size=200000):
     """
     Vérifie quelles couleurs sont dans le gamut de l'imprimante.
 
     Méthode : On convertit sRGB → Printer → sRGB (round-trip)
     Si la couleur change significativement, elle était hors gamut.
+
+    Pas de LUT 3D interpolée côté NumPy : LittleCMS optimise déjà chaque
+    transform en table interpolée, et une interpolation trilinéaire
+    (map_coordinates) coûte autant par canal qu'un transform complet,
+    tout en étant approximative près de la frontière du gamut.
     """
     n = len(rgb_colors)
     in_gamut_mask = np.zeros(n, dtype=bool)
@@ -55,21 +65,31 @@ def check_gamut_batch(rgb_colors, srgb_profile, printer_profile, batch_size=1000
 
     print(f"Vérification du gamut par lots de {batch_size}...")
 
-    for start in range(0, n, batch_size):
-        end = min(start + batch_size, n)
-        batch = rgb_colors[start:end]
-
-        # Créer une image 1D avec les couleurs du batch
-        img = Image.new('RGB', (len(batch), 1))
-        img.putdata([tuple(c) for c in batch])
+    # Un canevas PIL par thread, alloué au premier lot
+    thread_state = threading.local()
 
-        # Round-trip: sRGB → Printer → sRGB
-        img_printer = ImageCms.applyTransform(img, transform_to_printer)
-        img_back = ImageCms.applyTransform(img_printer, transform_to_srgb)
+    def process_batch(start):
+        """Teste le gamut du lot commençant à start, sur le canevas du thread"""
+        end = min(start + batch_size, n)
+        batch = np.ascontiguousarray(rgb_colors[start:end], dtype=np.uint8)
+
+        # Image 1D du lot : le canevas du thread est réutilisé d'un lot à
+        # l'autre (seul le dernier lot, plus court, a sa propre image)
+        if end - start == batch_size:
+            if not hasattr(thread_state, "canvas"):
+                thread_state.canvas = Image.new('RGB', (batch_size, 1))
+            img = thread_state.canvas
+            img.frombytes(batch.tobytes())
+        else:
+            img = Image.fromarray(batch.reshape(1, -1, 3))
+
+        # Round-trip sur place : sRGB → Printer → sRGB
+        ImageCms.applyTransform(img, transform_to_printer, inPlace=True)
+        ImageCms.applyTransform(img, transform_to_srgb, inPlace=True)
 
         # Comparer original et round-trip
-        original = np.array(list(img.getdata()), dtype=np.int16)
-        roundtrip = np.array(list(img_back.getdata()), dtype=np.int16)
+        original = batch.astype(np.int16)
+        roundtrip = np.asarray(img).reshape(-1, 3).astype(np.int16)
 
         # Calculer la différence (Delta RGB)
         diff = np.abs(original - roundtrip)
@@ -78,11 +98,14 @@ def check_gamut_batch(rgb_colors, srgb_profile, printer_profile, batch_size=1000
         # Couleur dans le gamut si le round-trip change de moins de 2 unités RGB
         # (tolérance pour les erreurs d'arrondi)
         in_gamut_mask[start:end] = max_diff <= 2
-
-        # Progression
-        progress = (end / n) * 100
-        in_gamut_count = np.sum(in_gamut_mask[:end])
-        if (end % (batch_size * 10) == 0) or end == n:
+        return end
+
+    # Les transforms sont partagés entre les threads ; la progression est
+    # affichée dans le thread principal, dans l'ordre des lots
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for end in executor.map(process_batch, range(0, n, batch_size)):
+            progress = (end / n) * 100
+            in_gamut_count = np.sum(in_gamut_mask[:end])
             print(f"  {progress:5.1f}% | {end:,}/{n:,} | In gamut: {in_gamut_count:,} ({in_gamut_count/end*100:.1f}%)")
 
     return in_gamut_mask
@@ -99,8 +122,9 @@ def remove_perceptual_duplicates(rgb_colors, threshold=2):
     # Réduire les couleurs à une grille
     reduced = (rgb_colors // threshold) * threshold
 
-    # Trouver les indices uniques
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
+    # Trouver les indices uniques (sur des clés uint32, bien plus rapide
+    # que np.unique(axis=0) qui compare les lignes une à une)
+    _, unique_indices = np.unique(pack_rgb(reduced), return_index=True)
 
     # Trier pour garder l'ordre original
     unique_indices = np.sort(unique_indices)
@@ -113,8 +137,6 @@ def remove_perceptual_duplicates(rgb_colors, threshold=2):
 
 def analyze_gamut_distribution(rgb_colors, in_gamut_mask):
     """Analyse la distribution des couleurs in/out gamut par région HSV"""
-    from colorsys import rgb_to_hsv
-
     print("\nAnalyse de la distribution gamut:")
 
     in_gamut = rgb_colors[in_gamut_mask]
@@ -128,8 +150,7 @@ def analyze_gamut_distribution(rgb_colors, in_gamut_mask):
     def get_hsv_stats(colors, name):
         if len(colors) == 0:
             return
-        hsv = np.array([rgb_to_hsv(r/255, g/255, b/255) for r, g, b in colors[:10000]])  # Échantillon
-        h, s, v = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+        h, s, v = rgb_to_hsv(colors)  # Toutes les couleurs (conversion vectorisée)
         print(f"  {name}:")
         print(f"    Hue moyenne: {np.mean(h):.3f} (0=rouge, 0.33=vert, 0.66=bleu)")
         print(f"    Saturation moyenne: {np.mean(s):.3f}")
@@ -143,10 +164,7 @@ def save_colors(colors, file_path):
     """Sauvegarde les couleurs dans un fichier"""
     print(f"\nSauvegarde de {len(colors):,} couleurs dans {file_path}...")
 
-    with open(file_path, 'w') as f:
-        f.write("# R, G, B\n")
-        for r, g, b in colors:
-            f.write(f"{r}, {g}, {b}\n")
+    write_colors(colors, file_path)
 
     print(f"  → Fichier sauvegardé ({os.path.getsize(file_path) / 1024 / 1024:.1f} MB)")
 
@@ -6,11 +6,13 @@ Adapté pour 8 palettes : bleu, rouge, vert, jaune, orange, marron, gris, violet
 
 import numpy as np
 from PIL import Image, ImageDraw
-import colorsys
 import sys
 import json
 import os
-import gc
+
+from palette_cache import load_palette_colors
+from placement import (gaussian_coords, place_on_grid, draw_disks,
+                       PNG_COMPRESS_LEVEL, PREVIEW_REDUCING_GAP)
 
 # Configuration
 SIZE_FULL = 11811  # 1m x 1m @ 300 DPI
@@ -84,26 +86,17 @@ COLOR_FILTERS = {
 }
 
 
-def load_colors(file_path):
-    """Charge le fichier texte des couleurs (format CSV: R, G, B)"""
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
-
-
-def filter_colors(all_rgb, color_name):
-    """Filtre les couleurs selon la palette choisie"""
+def filter_colors(palette_colors, color_name):
+    """
+    Filtre les couleurs selon la palette choisie.
+    palette_colors = (p_rgb, h, s, v), base réduite issue de load_palette_colors.
+    """
     if color_name not in COLOR_FILTERS:
         raise ValueError(f"Couleur inconnue: {color_name}")
 
     cfg = COLOR_FILTERS[color_name]
 
-    # Réduction pour isolation des nuances discriminables (seuil 2-bits)
-    reduced = (all_rgb // 2) * 2
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
-    p_rgb = all_rgb[unique_indices]
-
-    # Conversion RGB -> HSV
-    r_n, g_n, b_n = p_rgb[:, 0] / 255.0, p_rgb[:, 1] / 255.0, p_rgb[:, 2] / 255.0
-    h, s, v = np.vectorize(colorsys.rgb_to_hsv)(r_n, g_n, b_n)
+    p_rgb, h, s, v = palette_colors
 
     # Filtre selon la configuration de couleur
     hue_mask = np.zeros(len(h), dtype=bool)
@@ -115,12 +108,11 @@ def filter_colors(all_rgb, color_name):
 
     mask = hue_mask & sat_mask & val_mask
 
-    filtered_rgb = p_rgb[mask]
-    filtered_s = s[mask]
-    filtered_v = v[mask]
-
-    del r_n, g_n, b_n, h, s, v
-    gc.collect()
+    # Un seul parcours du masque, puis trois extractions par indices
+    idx = np.flatnonzero(mask)
+    filtered_rgb = p_rgb[idx]
+    filtered_s = s[idx]
+    filtered_v = v[idx]
 
     return filtered_rgb, filtered_s, filtered_v
 
@@ -132,12 +124,17 @@ def generate_cloud(p_rgb, p_s, p_v, size, radius):
     sigma = size / 6.8
 
     # Distribution gaussienne
-    np.random.seed(42)  # Pour reproductibilité
-    x_raw = np.random.normal(center, sigma, num)
-    y_raw = np.random.normal(center, sigma, num)
+    rng = np.random.default_rng(42)  # Pour reproductibilité
+    x_raw = gaussian_coords(rng, center, sigma, num)
+    y_raw = gaussian_coords(rng, center, sigma, num)
     r_raw = np.sqrt((x_raw - center) ** 2 + (y_raw - center) ** 2)
 
     # Tri topographique (clair en haut, sombre au centre)
+    # Clés flottantes et tri par défaut (introsort vectorisé) : plus rapide qu'un
+    # tri stable sur clés int32 quantifiées, qui mélangerait en plus des nuances
+    # proches (s_col ne couvre que [-10, 1]). r entre dans une somme pondérée
+    # avec y, pas dans un tri lexicographique : ni np.lexsort ni r² à la place
+    # de r ne donneraient le même ordre
     s_pos = (y_raw * 10.0) + (r_raw * 1.0)
     idx_pos = np.argsort(s_pos)
     s_col = (-p_v * 10.0) + ((1.0 - p_s) * 1.0)
@@ -148,30 +145,26 @@ def generate_cloud(p_rgb, p_s, p_v, size, radius):
     final_rgb = p_rgb[idx_col]
 
     del x_raw, y_raw, r_raw, s_pos, s_col, idx_pos, idx_col
-    gc.collect()
-
-    # Dessin
-    img = Image.new('RGB', (size, size), (255, 255, 255))
-    draw = ImageDraw.Draw(img)
-    occupied = set()
-    placed = 0
 
+    # Occupation de la grille, vectorisée : dans l'ordre du tri, seul le
+    # premier point de chaque case (dans les limites de l'image) est placé
     grid_size = max(1, int(radius * 1.5))
 
-    for i in range(num):
-        px, py = final_x[i], final_y[i]
-        qx, qy = int(px // grid_size) * grid_size, int(py // grid_size) * grid_size
+    qx = (final_x // grid_size) * grid_size
+    qy = (final_y // grid_size) * grid_size
+    in_bounds = np.flatnonzero((radius <= qx) & (qx < size - radius) &
+                               (radius <= qy) & (qy < size - radius))
+
+    grid_cells = size // grid_size + 1
+    occupied = np.zeros((grid_cells, grid_cells), dtype=bool)
+    selected = in_bounds[place_on_grid(final_x[in_bounds], final_y[in_bounds], occupied, grid_size)]
 
-        if (qx, qy) not in occupied and radius <= qx < size - radius and radius <= qy < size - radius:
-            c = final_rgb[i]
-            draw.ellipse(
-                [px - radius, py - radius, px + radius, py + radius],
-                fill=(int(c[0]), int(c[1]), int(c[2]))
-            )
-            occupied.add((qx, qy))
-            placed += 1
+    # Dessin
+    img = Image.new('RGB', (size, size), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw_disks(draw, final_x[selected], final_y[selected], final_rgb[selected], radius)
 
-    return img, placed
+    return img, len(selected)
 
 
 def main():
@@ -194,10 +187,10 @@ def main():
 
     # Chargement et filtrage
     print(f"Chargement des couleurs...", file=sys.stderr)
-    all_rgb = load_colors(data_file)
+    palette_colors = load_palette_colors(data_file)
 
     print(f"Filtrage pour '{color_name}'...", file=sys.stderr)
-    p_rgb, p_s, p_v = filter_colors(all_rgb, color_name)
+    p_rgb, p_s, p_v = filter_colors(palette_colors, color_name)
 
     print(f"{len(p_rgb)} nuances candidates trouvées", file=sys.stderr)
 
@@ -210,17 +203,17 @@ def main():
     img_full, placed_full = generate_cloud(p_rgb, p_s, p_v, SIZE_FULL, RADIUS)
     full_filename = f"{placed_full}_{color_name}_ColorPaps_HQ.png"
     full_path = os.path.join(output_dir, full_filename)
-    img_full.save(full_path, dpi=DPI)
+    img_full.save(full_path, dpi=DPI, compress_level=PNG_COMPRESS_LEVEL)
 
     # Aperçu par redimensionnement de la HD (fidélité garantie)
     print(f"Création de l'aperçu par redimensionnement...", file=sys.stderr)
-    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS)
+    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS,
+                                 reducing_gap=PREVIEW_REDUCING_GAP)
     preview_filename = f"{color_name}_preview.png"
     preview_path = os.path.join(output_dir, preview_filename)
     img_preview.save(preview_path)
 
     del img_full, img_preview
-    gc.collect()
 
     # Résultat JSON
     result = {
@@ -7,11 +7,13 @@ Retourne les points en JSON pour animation côté client
 
 import numpy as np
 from PIL import Image, ImageDraw
-import colorsys
 import sys
 import json
 import os
-import gc
+
+from palette_cache import load_palette_colors
+from placement import (gaussian_coords, reflect_coord, scatter_sorted, place_on_grid,
+                       draw_disks, COLOR_SEEDS, PNG_COMPRESS_LEVEL, PREVIEW_REDUCING_GAP)
 
 # Configuration
 SIZE_FULL = 11811  # 1m x 1m @ 300 DPI
@@ -108,26 +110,13 @@ def get_positions(num_colors):
         ]
 
 
-def load_colors(file_path):
-    """Charge le fichier texte des couleurs (format CSV: R, G, B)"""
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
-
-
-def filter_colors_for_palette(all_rgb, color_names):
+def filter_colors_for_palette(palette_colors, color_names):
     """
     Filtre les couleurs pour plusieurs palettes.
     Assure l'unicité des couleurs entre les palettes.
+    palette_colors = (p_rgb, h, s, v), base réduite issue de load_palette_colors.
     """
-    # Réduction pour nuances discriminables
-    reduced = (all_rgb // 2) * 2
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
-    p_rgb = all_rgb[unique_indices]
-
-    # Conversion RGB -> HSV
-    r_n = p_rgb[:, 0] / 255.0
-    g_n = p_rgb[:, 1] / 255.0
-    b_n = p_rgb[:, 2] / 255.0
-    h, s, v = np.vectorize(colorsys.rgb_to_hsv)(r_n, g_n, b_n)
+    p_rgb, h, s, v = palette_colors
 
     assigned = np.zeros(len(p_rgb), dtype=bool)
     results = {}
@@ -150,37 +139,27 @@ def filter_colors_for_palette(all_rgb, color_names):
 
         mask = hue_mask & sat_mask & val_mask & ~assigned
 
-        results[color_name] = (p_rgb[mask], s[mask], v[mask])
+        # Un seul parcours du masque, puis trois extractions par indices
+        idx = np.flatnonzero(mask)
+        results[color_name] = (p_rgb[idx], s[idx], v[idx])
         assigned |= mask
 
-    del r_n, g_n, b_n, h, s, v
-    gc.collect()
-
     return results
 
 
-def reflect_coord(coord, min_val, max_val):
-    """Réfléchit une coordonnée dans les limites [min_val, max_val]"""
-    result = coord.copy()
-    for _ in range(10):
-        below_min = result < min_val
-        result[below_min] = 2 * min_val - result[below_min]
-        above_max = result > max_val
-        result[above_max] = 2 * max_val - result[above_max]
-        if np.all((result >= min_val) & (result <= max_val)):
-            break
-    return np.clip(result, min_val, max_val)
-
-
 def generate_points_data(color_data, color_names, size, radius):
     """
     Génère les données de points pour l'animation.
-    Retourne une liste de points avec positions et couleurs.
+    Retourne les points en colonnes : {"x": [...], "y": [...], "r": [...],
+    "g": [...], "b": [...]}, plus compact en JSON qu'un dict par point.
     """
     positions = get_positions(len(color_names))
-    all_points = []
-    occupied = set()
+    placed_x = []
+    placed_y = []
+    placed_rgb = []
     grid_size = radius * 2
+    grid_cells = size // grid_size + 1
+    occupied = np.zeros((grid_cells, grid_cells), dtype=bool)
 
     counts = {name: len(data[0]) for name, data in color_data.items()}
     max_count = max(counts.values()) if counts else 1
@@ -204,9 +183,9 @@ def generate_points_data(color_data, color_names, size, radius):
         density_factor = np.sqrt(num / max_count)
         sigma = base_sigma * (0.5 + 0.5 * density_factor)
 
-        np.random.seed(hash(color_name) % (2**32))
-        x_raw = np.random.normal(cx, sigma, num)
-        y_raw = np.random.normal(cy, sigma, num)
+        rng = np.random.default_rng(COLOR_SEEDS[color_name])
+        x_raw = gaussian_coords(rng, cx, sigma, num)
+        y_raw = gaussian_coords(rng, cy, sigma, num)
 
         # Réfléchir les points hors zone au lieu de les rejeter
         x_reflected = reflect_coord(x_raw, radius, size - radius - 1)
@@ -214,35 +193,38 @@ def generate_points_data(color_data, color_names, size, radius):
 
         # Mélanger les couleurs aléatoirement (pas de tri topographique pour l'animation)
         color_indices = np.arange(num)
-        np.random.shuffle(color_indices)
+        rng.shuffle(color_indices)
         shuffled_rgb = p_rgb[color_indices]
 
-        for i in range(num):
-            px, py = x_reflected[i], y_reflected[i]
-            qx = int(px // grid_size) * grid_size
-            qy = int(py // grid_size) * grid_size
-
-            if (qx, qy) not in occupied:
-                c = shuffled_rgb[i]
-                all_points.append({
-                    "x": float(px),
-                    "y": float(py),
-                    "r": int(c[0]),
-                    "g": int(c[1]),
-                    "b": int(c[2])
-                })
-                occupied.add((qx, qy))
-
-    # Mélanger les points de façon chaotique pour une animation naturelle
-    # Utiliser un seed basé sur le temps pour plus de variété
-    import time
-    np.random.seed(int(time.time() * 1000) % (2**32))
-
-    # Double mélange pour casser tout pattern résiduel
-    np.random.shuffle(all_points)
-    np.random.shuffle(all_points)
-
-    return all_points
+        # Indices des points placés ; les coordonnées et couleurs restent
+        # dans les tableaux NumPy
+        placed = place_on_grid(x_reflected, y_reflected, occupied, grid_size)
+
+        placed_x.append(x_reflected[placed])
+        placed_y.append(y_reflected[placed])
+        placed_rgb.append(shuffled_rgb[placed])
+
+    if not placed_x:
+        return {"x": [], "y": [], "r": [], "g": [], "b": []}
+
+    xs = np.concatenate(placed_x)
+    ys = np.concatenate(placed_y)
+    rgbs = np.concatenate(placed_rgb)
+
+    # Mélanger les points de façon chaotique pour une animation naturelle :
+    # une permutation unique des colonnes, générateur initialisé par
+    # l'entropie du système pour plus de variété
+    rng = np.random.default_rng()
+    perm = rng.permutation(len(xs))
+    xs, ys, rgbs = xs[perm], ys[perm], rgbs[perm]
+
+    return {
+        "x": xs.tolist(),
+        "y": ys.tolist(),
+        "r": rgbs[:, 0].tolist(),
+        "g": rgbs[:, 1].tolist(),
+        "b": rgbs[:, 2].tolist()
+    }
 
 
 def generate_full_image(color_data, color_names, size, radius):
@@ -250,8 +232,9 @@ def generate_full_image(color_data, color_names, size, radius):
     positions = get_positions(len(color_names))
     img = Image.new('RGB', (size, size), (255, 255, 255))
     draw = ImageDraw.Draw(img)
-    occupied = set()
     grid_size = radius * 2
+    grid_cells = size // grid_size + 1
+    occupied = np.zeros((grid_cells, grid_cells), dtype=bool)
     total_placed = 0
 
     counts = {name: len(data[0]) for name, data in color_data.items()}
@@ -277,38 +260,18 @@ def generate_full_image(color_data, color_names, size, radius):
         density_factor = np.sqrt(num / max_count)
         sigma = base_sigma * (0.5 + 0.5 * density_factor)
 
-        np.random.seed(hash(color_name) % (2**32))
-        x_raw = np.random.normal(cx, sigma, num)
-        y_raw = np.random.normal(cy, sigma, num)
+        # Positions réfléchies dans l'image et triées
+        final_x, final_y = scatter_sorted(num, cx, cy, sigma, COLOR_SEEDS[color_name],
+                                          (radius, size - radius - 1))
 
-        # Réfléchir les points hors zone au lieu de les rejeter
-        x_reflected = reflect_coord(x_raw, radius, size - radius - 1)
-        y_reflected = reflect_coord(y_raw, radius, size - radius - 1)
-
-        r_raw = np.sqrt((x_raw - cx) ** 2 + (y_raw - cy) ** 2)
-
-        s_pos = (y_reflected * 10.0) + (r_raw * 1.0)
-        idx_pos = np.argsort(s_pos)
         s_col = (-p_v * 10.0) + ((1.0 - p_s) * 1.0)
         idx_col = np.argsort(s_col)
-
-        final_x = x_reflected[idx_pos]
-        final_y = y_reflected[idx_pos]
         final_rgb = p_rgb[idx_col]
 
-        for i in range(num):
-            px, py = final_x[i], final_y[i]
-            qx = int(px // grid_size) * grid_size
-            qy = int(py // grid_size) * grid_size
+        placed = place_on_grid(final_x, final_y, occupied, grid_size)
 
-            if (qx, qy) not in occupied:
-                c = final_rgb[i]
-                draw.ellipse(
-                    [px - radius, py - radius, px + radius, py + radius],
-                    fill=(int(c[0]), int(c[1]), int(c[2]))
-                )
-                occupied.add((qx, qy))
-                total_placed += 1
+        draw_disks(draw, final_x[placed], final_y[placed], final_rgb[placed], radius)
+        total_placed += len(placed)
 
     return img, total_placed, total_available
 
@@ -341,13 +304,10 @@ def main():
 
     # Chargement et filtrage
     print("Chargement des couleurs...", file=sys.stderr)
-    all_rgb = load_colors(data_file)
+    palette_colors = load_palette_colors(data_file)
 
     print(f"Filtrage pour {color_names}...", file=sys.stderr)
-    color_data = filter_colors_for_palette(all_rgb, color_names)
-
-    del all_rgb
-    gc.collect()
+    color_data = filter_colors_for_palette(palette_colors, color_names)
 
     # Génération image haute résolution
     print("Génération haute résolution...", file=sys.stderr)
@@ -358,11 +318,12 @@ def main():
     full_path = os.path.join(output_dir, full_filename)
 
     # Sauvegarder l'image HD (on la génère de toute façon, autant la garder)
-    img_full.save(full_path, dpi=DPI)
+    img_full.save(full_path, dpi=DPI, compress_level=PNG_COMPRESS_LEVEL)
     print(f"Image HD sauvegardée: {full_path}", file=sys.stderr)
 
     # Aperçu par redimensionnement (même méthode que Couleurs)
-    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS)
+    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS,
+                                 reducing_gap=PREVIEW_REDUCING_GAP)
     preview_filename = f"palette_{palette_name}_preview.png"
     preview_path = os.path.join(output_dir, preview_filename)
     img_preview.save(preview_path)
@@ -7,11 +7,14 @@ Les nuages sont plus étalés et les points hors cadre sont clampés aux bords
 
 import numpy as np
 from PIL import Image, ImageDraw
-import colorsys
 import sys
 import json
 import os
-import gc
+from concurrent.futures import ThreadPoolExecutor
+
+from palette_cache import load_palette_colors
+from placement import (scatter_sorted, place_on_grid, draw_disks, COLOR_SEEDS,
+                       PNG_COMPRESS_LEVEL, PREVIEW_REDUCING_GAP)
 
 # Configuration
 SIZE_FULL = 11811  # 1m x 1m @ 300 DPI
@@ -104,26 +107,14 @@ def get_positions(num_colors):
         ]
 
 
-def load_colors(file_path):
-    """Charge le fichier texte des couleurs (format CSV: R, G, B)"""
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
-
-
-def filter_colors_for_palette(all_rgb, color_names):
+def filter_colors_for_palette(palette_colors, color_names):
     """
     Filtre les couleurs pour plusieurs palettes.
     Assure l'unicité des couleurs entre les palettes.
+    palette_colors = (p_rgb, h, s, v), base réduite issue de load_palette_colors.
+    Chaque palette est triée de la plus claire à la plus sombre.
     """
-    # Réduction pour nuances discriminables
-    reduced = (all_rgb // 2) * 2
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
-    p_rgb = all_rgb[unique_indices]
-
-    # Conversion RGB -> HSV
-    r_n = p_rgb[:, 0] / 255.0
-    g_n = p_rgb[:, 1] / 255.0
-    b_n = p_rgb[:, 2] / 255.0
-    h, s, v = np.vectorize(colorsys.rgb_to_hsv)(r_n, g_n, b_n)
+    p_rgb, h, s, v = palette_colors
 
     assigned = np.zeros(len(p_rgb), dtype=bool)
     results = {}
@@ -146,26 +137,19 @@ def filter_colors_for_palette(all_rgb, color_names):
 
         mask = hue_mask & sat_mask & val_mask & ~assigned
 
-        results[color_name] = (p_rgb[mask], s[mask], v[mask])
-        assigned |= mask
-
-    del r_n, g_n, b_n, h, s, v
-    gc.collect()
+        # Un seul parcours du masque, puis trois extractions par indices
+        idx = np.flatnonzero(mask)
 
-    return results
+        # Nuances triées ici, une fois pour toutes (clés float64, voir
+        # generate_cloud.py) : le générateur les reçoit dans l'ordre du tri
+        # topographique et n'a plus qu'à trier les positions
+        s_col = (-v[idx] * 10.0) + ((1.0 - s[idx]) * 1.0)
+        idx = idx[np.argsort(s_col)]
 
+        results[color_name] = (p_rgb[idx], s[idx], v[idx])
+        assigned |= mask
 
-def reflect_coord(coord, min_val, max_val):
-    """Réfléchit une coordonnée dans les limites [min_val, max_val]"""
-    result = coord.copy()
-    for _ in range(10):
-        below_min = result < min_val
-        result[below_min] = 2 * min_val - result[below_min]
-        above_max = result > max_val
-        result[above_max] = 2 * max_val - result[above_max]
-        if np.all((result >= min_val) & (result <= max_val)):
-            break
-    return np.clip(result, min_val, max_val)
+    return results
 
 
 def generate_full_image_crop(color_data, color_names, size, radius):
@@ -178,66 +162,53 @@ def generate_full_image_crop(color_data, color_names, size, radius):
     positions = get_positions(len(color_names))
     img = Image.new('RGB', (size, size), (255, 255, 255))
     draw = ImageDraw.Draw(img)
-    occupied = set()
     grid_size = radius * 2
+    grid_cells = size // grid_size + 1
+    occupied = np.zeros((grid_cells, grid_cells), dtype=bool)
     total_placed = 0
 
     counts = {name: len(data[0]) for name, data in color_data.items()}
     max_count = max(counts.values()) if counts else 1
     total_available = sum(counts.values())
 
-    for idx, color_name in enumerate(color_names):
-        if color_name not in color_data:
-            continue
-
-        p_rgb, p_s, p_v = color_data[color_name]
-        num = len(p_rgb)
+    # Une tâche de tirage par couleur ; la grille d'occupation impose de
+    # placer et dessiner ensuite dans l'ordre des couleurs
+    with ThreadPoolExecutor() as executor:
+        futures = []
+        for idx, color_name in enumerate(color_names):
+            if color_name not in color_data:
+                continue
 
-        if num == 0:
-            continue
+            p_rgb = color_data[color_name][0]
+            num = len(p_rgb)
 
-        cx_norm, cy_norm = positions[idx]
+            if num == 0:
+                continue
 
-        # VERSION CROP : pas de marge, les centres sont directement sur la grille normalisée
-        cx = cx_norm * size
-        cy = cy_norm * size
+            cx_norm, cy_norm = positions[idx]
 
-        # VERSION CROP : sigma beaucoup plus grand pour déborder
-        base_sigma = size / (4 + len(color_names))  # Diviseur plus petit = sigma plus grand
-        density_factor = np.sqrt(num / max_count)
-        sigma = base_sigma * (0.7 + 0.5 * density_factor)  # Facteur de base plus élevé
+            # VERSION CROP : pas de marge, les centres sont directement sur la grille normalisée
+            cx = cx_norm * size
+            cy = cy_norm * size
 
-        np.random.seed(hash(color_name) % (2**32))
-        x_raw = np.random.normal(cx, sigma, num)
-        y_raw = np.random.normal(cy, sigma, num)
+            # VERSION CROP : sigma beaucoup plus grand pour déborder
+            base_sigma = size / (4 + len(color_names))  # Diviseur plus petit = sigma plus grand
+            density_factor = np.sqrt(num / max_count)
+            sigma = base_sigma * (0.7 + 0.5 * density_factor)  # Facteur de base plus élevé
 
-        x_reflected = reflect_coord(x_raw, radius, size - radius - 1)
-        y_reflected = reflect_coord(y_raw, radius, size - radius - 1)
+            future = executor.submit(
+                scatter_sorted, num, cx, cy, sigma, COLOR_SEEDS[color_name],
+                (radius, size - radius - 1)
+            )
+            futures.append((future, p_rgb))
 
-        r_raw = np.sqrt((x_raw - cx) ** 2 + (y_raw - cy) ** 2)
+        for future, final_rgb in futures:
+            final_x, final_y = future.result()
 
-        s_pos = (y_reflected * 10.0) + (r_raw * 1.0)
-        idx_pos = np.argsort(s_pos)
-        s_col = (-p_v * 10.0) + ((1.0 - p_s) * 1.0)
-        idx_col = np.argsort(s_col)
+            placed = place_on_grid(final_x, final_y, occupied, grid_size)
 
-        final_x = x_reflected[idx_pos]
-        final_y = y_reflected[idx_pos]
-        final_rgb = p_rgb[idx_col]
-
-        for i in range(num):
-            px, py = final_x[i], final_y[i]
-            qx = int(px // grid_size) * grid_size
-            qy = int(py // grid_size) * grid_size
-
-            if (qx, qy) not in occupied:
-                c = final_rgb[i]
-                draw.ellipse(
-                    [px - radius, py - radius, px + radius, py + radius],
-                    fill=(int(c[0]), int(c[1]), int(c[2]))
-                )
-                occupied.add((qx, qy))
-                total_placed += 1
+            draw_disks(draw, final_x[placed], final_y[placed], final_rgb[placed], radius)
+            total_placed += len(placed)
 
     return img, total_placed, total_available
 
@@ -269,13 +240,10 @@ def main():
 
     # Chargement et filtrage
     print("Chargement des couleurs...", file=sys.stderr)
-    all_rgb = load_colors(data_file)
+    palette_colors = load_palette_colors(data_file)
 
     print(f"Filtrage pour {color_names}...", file=sys.stderr)
-    color_data = filter_colors_for_palette(all_rgb, color_names)
-
-    del all_rgb
-    gc.collect()
+    color_data = filter_colors_for_palette(palette_colors, color_names)
 
     # Génération image haute résolution - VERSION CROP
     print("Génération haute résolution (crop)...", file=sys.stderr)
@@ -286,11 +254,15 @@ def main():
     full_path = os.path.join(output_dir, full_filename)
 
     # Sauvegarder l'image HD
-    img_full.save(full_path, dpi=DPI)
+    img_full.save(full_path, dpi=DPI, compress_level=PNG_COMPRESS_LEVEL)
     print(f"Image HD sauvegardée: {full_path}", file=sys.stderr)
 
-    # Aperçu par redimensionnement
-    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS)
+    # Aperçu par redimensionnement de la HD, pas par rendu direct à la taille
+    # de l'aperçu : le rayon réduit d'autant tomberait sous le pixel et la
+    # grille d'occupation ne retiendrait plus les mêmes points (ni le même
+    # compte) ; la moyenne LANCZOS reste fidèle au rendu imprimé
+    img_preview = img_full.resize((SIZE_PREVIEW, SIZE_PREVIEW), Image.LANCZOS,
+                                 reducing_gap=PREVIEW_REDUCING_GAP)
     preview_filename = f"palette_crop_{palette_name}_preview.png"
     preview_path = os.path.join(output_dir, preview_filename)
     img_preview.save(preview_path)
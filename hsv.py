@@ -0,0 +1,48 @@
+"""
+Conversion RGB → HSV vectorisée (équivalent de colorsys.rgb_to_hsv).
+
+np.vectorize(colorsys.rgb_to_hsv) reste une boucle Python par couleur ;
+ici tout le tableau est converti en quelques opérations NumPy. Les calculs
+suivent ceux de colorsys, dans le même ordre et en float64, pour que les
+seuils des filtres de couleur sélectionnent exactement les mêmes nuances.
+"""
+
+import numpy as np
+
+
+def rgb_to_hsv(rgb_colors):
+    """
+    Convertit un tableau N×3 uint8 (0-255) en trois tableaux h, s, v (0-1).
+    """
+    rgb_colors = np.asarray(rgb_colors)
+
+    # Max / min et comparaisons sur les entiers uint8 (3× moins de mémoire
+    # parcourue qu'en float64) ; x / 255 est monotone, le résultat est identique
+    max_int = rgb_colors.max(axis=1)
+    min_int = rgb_colors.min(axis=1)
+    r_is_max = rgb_colors[:, 0] == max_int
+    g_is_max = rgb_colors[:, 1] == max_int
+    gray = max_int == min_int  # minc == maxc : teinte et saturation nulles
+
+    r = rgb_colors[:, 0] / 255.0
+    g = rgb_colors[:, 1] / 255.0
+    b = rgb_colors[:, 2] / 255.0
+    maxc = max_int / 255.0
+    minc = min_int / 255.0
+    v = maxc
+
+    delta = maxc - minc
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(gray, 0.0, delta / maxc)
+
+        rc = (maxc - r) / delta
+        gc = (maxc - g) / delta
+        bc = (maxc - b) / delta
+
+    # Même priorité que colorsys : R, puis G, puis B
+    h = np.where(r_is_max, bc - gc,
+                 np.where(g_is_max, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+
+    return h, s, v
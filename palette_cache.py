@@ -0,0 +1,84 @@
+"""
+Cache disque de la base de nuances utilisée par les générateurs.
+
+Le fichier de couleurs ne change pas d'une génération à l'autre : la
+réduction (seuil 2-bits), le dédoublonnage et la conversion HSV donnent
+toujours le même résultat. Ils sont calculés une fois puis sauvegardés
+dans un .npz du dossier cache/ (à côté du fichier texte), nommé d'après
+l'empreinte MD5 du contenu : un fichier modifié donne une nouvelle clé,
+un simple changement de date (copie, checkout) garde la même.
+"""
+
+import functools
+import hashlib
+import numpy as np
+import os
+import zipfile
+
+from color_io import read_colors, reduced_unique_indices, write_atomic
+from hsv import rgb_to_hsv
+
+
+def reduce_colors(all_rgb):
+    """
+    Réduit la base aux nuances discriminables et calcule leur HSV.
+    Retourne (p_rgb, h, s, v).
+    """
+    # Réduction pour isolation des nuances discriminables (seuil 2-bits)
+    p_rgb = all_rgb[reduced_unique_indices(all_rgb)]
+
+    # Conversion RGB -> HSV (vectorisée)
+    h, s, v = rgb_to_hsv(p_rgb)
+
+    return p_rgb, h, s, v
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Empreinte MD5 (hexadécimale) du contenu d'un fichier, lu par blocs"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_palette_colors(data_file):
+    """
+    Charge la base réduite (p_rgb, h, s, v) depuis le cache .npz, ou la
+    calcule depuis le fichier texte et met le cache à jour.
+    Dans un processus qui reste chargé, les appels suivants réutilisent la
+    base en mémoire tant que la date de modification du fichier ne change pas.
+    Les tableaux retournés sont partagés entre appels, donc en lecture seule.
+    """
+    data_file = os.path.abspath(data_file)
+    return _load_palette_colors(data_file, os.path.getmtime(data_file))
+
+
+@functools.lru_cache(maxsize=1)
+def _load_palette_colors(data_file, mtime):
+    """Chargement effectif ; mtime ne sert que de clé au cache mémoire"""
+    cache_dir = os.path.join(os.path.dirname(data_file), "cache")
+    cache_path = os.path.join(cache_dir, f"{file_digest(data_file)}_palette.npz")
+
+    arrays = None
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cache:
+                arrays = cache["rgb"], cache["h"], cache["s"], cache["v"]
+        except (zipfile.BadZipFile, ValueError, KeyError, EOFError, OSError):
+            pass  # Cache corrompu ou tronqué : recalculé et réécrit ci-dessous
+
+    if arrays is None:
+        arrays = reduce_colors(read_colors(data_file))
+        p_rgb, h, s, v = arrays
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Un autre générateur lancé en parallèle ne lit jamais un .npz partiel
+            write_atomic(cache_path, lambda f: np.savez(f, rgb=p_rgb, h=h, s=s, v=v))
+        except OSError:
+            pass  # Dossier en lecture seule : pas de cache, recalcul au prochain appel
+
+    for array in arrays:
+        array.flags.writeable = False
+    return tuple(arrays)
@@ -0,0 +1,120 @@
+"""
+Tirage, placement et dessin des points communs aux générateurs de nuages.
+
+Chaque générateur trie ses positions et ses couleurs, puis place les points
+dans l'ordre sur une grille d'occupation : une case ne reçoit qu'un point.
+La sélection est faite en une passe NumPy pour toute une couleur ; il ne
+reste en Python que la boucle de dessin, où draw.ellipse est plus rapide
+qu'un tampon de disque écrit point par point dans un tableau NumPy.
+Regroupe aussi les réglages d'enregistrement des images générées.
+"""
+
+import numpy as np
+
+# Compression zlib de l'image HD : niveau 1 au lieu de 6 par défaut,
+# encodage ~1.7× plus rapide pour un fichier ~20 % plus gros
+PNG_COMPRESS_LEVEL = 1
+
+# Aperçu : réduction entière rapide (Image.reduce) jusqu'à 3× la taille
+# cible, puis LANCZOS sur l'image déjà réduite (~5× plus rapide, écart
+# moyen < 0.2 niveau RGB avec un LANCZOS direct)
+PREVIEW_REDUCING_GAP = 3.0
+
+# Graines aléatoires fixes par couleur (hash() est salé à chaque lancement
+# de Python : les placements n'étaient pas reproductibles d'une exécution à l'autre)
+COLOR_SEEDS = {
+    "bleu": 1001,
+    "rouge": 1002,
+    "vert": 1003,
+    "jaune": 1004,
+    "orange": 1005,
+    "marron": 1006,
+    "gris": 1007,
+    "violet": 1008
+}
+
+
+def gaussian_coords(rng, center, sigma, num):
+    """
+    Tire num coordonnées gaussiennes (centre, sigma) en float32 : deux fois
+    moins de mémoire parcourue qu'en float64 pour les réflexions et les tris,
+    précision largement suffisante à l'échelle du pixel.
+    """
+    coords = rng.standard_normal(num, dtype=np.float32)
+    coords *= sigma
+    coords += center
+    return coords
+
+
+def reflect_coord(coord, min_val, max_val):
+    """Réfléchit une coordonnée dans les limites [min_val, max_val]"""
+    # Réflexions successives sur les bords = onde triangulaire de période 2 × étendue
+    span = max_val - min_val
+    period = 2 * span
+    t = np.mod(coord - min_val, period)
+    return min_val + np.where(t <= span, t, period - t)
+
+
+def scatter_sorted(num, cx, cy, sigma, seed, bounds=None):
+    """
+    Tire num positions gaussiennes autour de (cx, cy) et les trie (tri
+    topographique) pour les associer à des nuances déjà triées.
+    bounds = (min, max) : les points hors zone y sont réfléchis au lieu
+    d'être rejetés ; le rayon du tri reste mesuré avant réflexion.
+    Générateur local (PCG64) créé depuis seed, sans état global : plusieurs
+    couleurs peuvent être tirées en parallèle (NumPy relâche le GIL).
+    Retourne (final_x, final_y).
+    """
+    rng = np.random.default_rng(seed)
+    x_raw = gaussian_coords(rng, cx, sigma, num)
+    y_raw = gaussian_coords(rng, cy, sigma, num)
+    r_raw = np.sqrt((x_raw - cx) ** 2 + (y_raw - cy) ** 2)
+
+    if bounds is None:
+        xs, ys = x_raw, y_raw
+    else:
+        xs = reflect_coord(x_raw, *bounds)
+        ys = reflect_coord(y_raw, *bounds)
+
+    # Tri topographique sur clés flottantes (voir generate_cloud.py)
+    s_pos = (ys * 10.0) + (r_raw * 1.0)
+    idx_pos = np.argsort(s_pos)
+
+    return xs[idx_pos], ys[idx_pos]
+
+
+def place_on_grid(xs, ys, occupied, grid_size):
+    """
+    Sélectionne, dans l'ordre, les points qui tombent dans une case libre
+    de la grille d'occupation (tableau booléen, mis à jour sur place).
+    Équivalent vectorisé du test "case déjà occupée ?" point par point :
+    dans chaque case libre, seul le premier point est retenu.
+    Retourne les indices des points placés, dans leur ordre d'origine.
+    """
+    cell_x = (xs // grid_size).astype(np.intp)
+    cell_y = (ys // grid_size).astype(np.intp)
+    free = np.flatnonzero(~occupied[cell_x, cell_y])
+
+    cell_keys = cell_x[free] * occupied.shape[1] + cell_y[free]
+    _, first = np.unique(cell_keys, return_index=True)
+    placed = free[np.sort(first)]
+
+    occupied[cell_x[placed], cell_y[placed]] = True
+    return placed
+
+
+def draw_disks(draw, xs, ys, rgb, radius):
+    """
+    Dessine un disque de rayon radius par point (xs, ys) avec la couleur rgb
+    correspondante (tableau N×3 uint8).
+    Pas de tampon précalculé : coller un masque de disque (antialiasé ou non)
+    par Image.paste coûte ~2.5× plus cher par point que draw.ellipse, dont la
+    rastérisation est négligeable devant l'appel lui-même.
+    """
+    # Boîtes englobantes et couleurs converties en bloc en objets Python :
+    # la boucle n'a plus qu'à appeler draw.ellipse
+    boxes = np.stack([xs - radius, ys - radius, xs + radius, ys + radius], axis=1).tolist()
+    fills = [tuple(c) for c in rgb.tolist()]
+
+    for box, fill in zip(boxes, fills):
+        draw.ellipse(box, fill=fill)
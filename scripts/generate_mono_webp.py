@@ -6,6 +6,7 @@ Utilise le même format que vert_hq.webp.
 
 from PIL import Image
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration
 INPUT_DIR = "/home/arthurc/dev/projects/ColorPaps/public/generated"
@@ -25,21 +26,27 @@ MONO_IMAGES = {
 # Qualité WebP (ajuster selon la taille souhaitée)
 WEBP_QUALITY = 85
 
+# Conversions en parallèle, une image par processus : l'encodeur WebP
+# (method=6) est mono-thread. Chaque image 11811x11811 occupe ~400 MB en
+# mémoire une fois décodée, réduire cette valeur si la RAM est limitée
+MAX_WORKERS = os.cpu_count() or 1
+
 def convert_to_webp(color: str, filename: str):
     """Convertit une image PNG en WebP HD."""
     input_path = os.path.join(INPUT_DIR, filename)
     output_path = os.path.join(OUTPUT_DIR, f"{color}_hq.webp")
 
     if not os.path.exists(input_path):
-        print(f"ERREUR: {input_path} n'existe pas")
+        print(f"ERREUR: {input_path} n'existe pas", flush=True)
         return False
 
-    print(f"\nTraitement de {color}...")
-    print(f"  Source: {filename}")
+    # Messages regroupés et affichés en un bloc : les conversions tournent en
+    # parallèle et leurs sorties ne doivent pas s'entremêler
+    log = [f"\nTraitement de {color}...", f"  Source: {filename}"]
 
     # Charger l'image
     img = Image.open(input_path)
-    print(f"  Dimensions: {img.size[0]}x{img.size[1]}")
+    log.append(f"  Dimensions: {img.size[0]}x{img.size[1]}")
 
     # Convertir en RGB si nécessaire (WebP ne supporte pas tous les modes)
     if img.mode in ('RGBA', 'P'):
@@ -53,22 +60,22 @@ def convert_to_webp(color: str, filename: str):
     output_size = os.path.getsize(output_path) / (1024 * 1024)
     reduction = ((input_size - output_size) / input_size) * 100
 
-    print(f"  PNG original: {input_size:.2f} MB")
-    print(f"  WebP généré: {output_size:.2f} MB")
-    print(f"  Réduction: {reduction:.1f}%")
-    print(f"  Sauvegardé: {output_path}")
+    log.append(f"  PNG original: {input_size:.2f} MB")
+    log.append(f"  WebP généré: {output_size:.2f} MB")
+    log.append(f"  Réduction: {reduction:.1f}%")
+    log.append(f"  Sauvegardé: {output_path}")
+    print("\n".join(log), flush=True)
 
     return True
 
 def main():
     print("=" * 60)
     print("Génération des images WebP HD pour Monochromes")
-    print("=" * 60)
+    print("=" * 60, flush=True)  # Vider avant de lancer les processus
 
-    success_count = 0
-    for color, filename in MONO_IMAGES.items():
-        if convert_to_webp(color, filename):
-            success_count += 1
+    with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(MONO_IMAGES))) as executor:
+        results = executor.map(convert_to_webp, MONO_IMAGES.keys(), MONO_IMAGES.values())
+        success_count = sum(results)
 
     print("\n" + "=" * 60)
     print(f"Terminé: {success_count}/{len(MONO_IMAGES)} images générées")
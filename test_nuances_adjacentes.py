@@ -6,9 +6,11 @@ Trouve les 50 couleurs les plus proches les unes des autres (chaîne de voisins)
 
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import colorsys
 import os
 
+from palette_cache import load_palette_colors
+from placement import draw_disks
+
 # Configuration identique à palette_crop
 RADIUS = 6
 GRID_SIZE = RADIUS * 2
@@ -23,63 +25,58 @@ JAUNE_FILTER = {
 }
 
 
-def load_colors(file_path):
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
-
-
-def filter_yellow(all_rgb):
-    reduced = (all_rgb // 2) * 2
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
-    p_rgb = all_rgb[unique_indices]
-
-    r_n = p_rgb[:, 0] / 255.0
-    g_n = p_rgb[:, 1] / 255.0
-    b_n = p_rgb[:, 2] / 255.0
-    h, s, v = np.vectorize(colorsys.rgb_to_hsv)(r_n, g_n, b_n)
+def filter_yellow(palette_colors):
+    """
+    palette_colors = (p_rgb, h, s, v), base réduite issue de load_palette_colors :
+    réduction, dédoublonnage et HSV viennent du cache disque, il ne reste
+    que les seuils du filtre à appliquer.
+    """
+    p_rgb, h, s, v = palette_colors
 
     cfg = JAUNE_FILTER
-    hue_mask = np.zeros(len(h), dtype=bool)
-    for hue_min, hue_max in cfg["hue_ranges"]:
-        hue_mask |= (h >= hue_min) & (h <= hue_max)
-    sat_mask = (s >= cfg["sat_min"]) & (s <= cfg["sat_max"])
-    val_mask = (v >= cfg["val_min"]) & (v <= cfg["val_max"])
-    mask = hue_mask & sat_mask & val_mask
+    (hue_min, hue_max), = cfg["hue_ranges"]  # Une seule plage pour le jaune
+    idx = np.flatnonzero((h >= hue_min) & (h <= hue_max))
+    s_idx = s[idx]
+    v_idx = v[idx]
+    idx = idx[(s_idx >= cfg["sat_min"]) & (s_idx <= cfg["sat_max"]) &
+              (v_idx >= cfg["val_min"]) & (v_idx <= cfg["val_max"])]
 
-    return p_rgb[mask], h[mask], s[mask], v[mask]
+    return p_rgb[idx], h[idx], s[idx], v[idx]
 
 
 def find_nearest_neighbor_chain(rgb_array, start_idx, chain_length):
     """
     Trouve une chaîne de couleurs voisines les plus proches.
     Commence à start_idx et trouve successivement le voisin le plus proche.
+    Recherche exhaustive vectorisée plutôt qu'un cKDTree : pour une chaîne de
+    50 couleurs, la seule construction de l'arbre sur 1M de points coûte
+    autant que la chaîne entière en force brute (~0.5 s), et les nombreuses
+    égalités de distance entières imposeraient de départager à la main.
     """
     n = len(rgb_array)
+    rgb_int = rgb_array.astype(np.int32)
     used = np.zeros(n, dtype=bool)
     chain_indices = [start_idx]
     used[start_idx] = True
 
     current_idx = start_idx
-    current_rgb = rgb_array[current_idx].astype(float)
 
     for _ in range(chain_length - 1):
-        # Calculer distances à tous les points non utilisés
-        min_dist = float('inf')
-        nearest_idx = -1
-
-        for i in range(n):
-            if not used[i]:
-                dist = np.sqrt(np.sum((rgb_array[i].astype(float) - current_rgb)**2))
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest_idx = i
-
-        if nearest_idx == -1:
+        if used.all():
             break
 
+        # Distances au carré (entières, exactes) à tous les points en une
+        # passe ; la racine est inutile pour trouver le plus proche
+        diff = rgb_int - rgb_int[current_idx]
+        dist2 = np.einsum('ij,ij->i', diff, diff)
+        dist2[used] = np.iinfo(np.int32).max
+
+        # argmin renvoie le premier minimum, comme la comparaison stricte d'origine
+        nearest_idx = int(np.argmin(dist2))
+
         chain_indices.append(nearest_idx)
         used[nearest_idx] = True
         current_idx = nearest_idx
-        current_rgb = rgb_array[current_idx].astype(float)
 
     return chain_indices
 
@@ -89,10 +86,10 @@ def main():
     data_file = os.path.join(script_dir, "COULEURS_EPSON_UNIQUE_1.6M.txt")
 
     print("Chargement des couleurs...")
-    all_rgb = load_colors(data_file)
+    palette_colors = load_palette_colors(data_file)
 
     print("Filtrage des jaunes...")
-    yellow_rgb, yellow_h, yellow_s, yellow_v = filter_yellow(all_rgb)
+    yellow_rgb, yellow_h, yellow_s, yellow_v = filter_yellow(palette_colors)
     print(f"Nuances de jaune: {len(yellow_rgb)}")
 
     # Prendre un sous-ensemble pour la recherche de voisins (sinon trop long)
@@ -118,24 +115,24 @@ def main():
     print("=" * 80)
 
     # Calculer les écarts
-    deltas = []
-    for i in range(len(selected_rgb) - 1):
-        delta = np.sqrt(np.sum((selected_rgb[i].astype(float) - selected_rgb[i+1].astype(float))**2))
-        deltas.append(delta)
+    diffs = np.diff(selected_rgb.astype(np.int32), axis=0)
+    deltas = np.sqrt(np.einsum('ij,ij->i', diffs, diffs))
 
-    for i in range(min(10, len(selected_rgb))):
-        rgb = selected_rgb[i]
+    shown = (selected_rgb[:10].tolist(), selected_h[:10].tolist(),
+             selected_s[:10].tolist(), selected_v[:10].tolist())
+    for i, ((r, g, b), h, s, v) in enumerate(zip(*shown)):
         delta_str = f"Δ={deltas[i]:.1f}" if i < len(deltas) else ""
-        print(f"Point {i+1:2d}: RGB({rgb[0]:3d}, {rgb[1]:3d}, {rgb[2]:3d}) | H={selected_h[i]:.4f} S={selected_s[i]:.4f} V={selected_v[i]:.4f} {delta_str}")
+        print(f"Point {i+1:2d}: RGB({r:3d}, {g:3d}, {b:3d}) | H={h:.4f} S={s:.4f} V={v:.4f} {delta_str}")
 
     print("...")
-    print(f"Point 50: RGB({selected_rgb[-1][0]:3d}, {selected_rgb[-1][1]:3d}, {selected_rgb[-1][2]:3d})")
+    r, g, b = selected_rgb[-1].tolist()
+    print(f"Point 50: RGB({r:3d}, {g:3d}, {b:3d})")
 
     print("\n" + "=" * 80)
     print("Écarts RGB entre points ADJACENTS:")
-    print(f"Delta min: {min(deltas):.2f}")
-    print(f"Delta max: {max(deltas):.2f}")
-    print(f"Delta moyen: {np.mean(deltas):.2f}")
+    print(f"Delta min: {deltas.min():.2f}")
+    print(f"Delta max: {deltas.max():.2f}")
+    print(f"Delta moyen: {deltas.mean():.2f}")
 
     # Créer l'image avec les 50 points
     margin = 50
@@ -146,24 +143,22 @@ def main():
     img = Image.new('RGB', (width, height), (255, 255, 255))
     draw = ImageDraw.Draw(img)
 
+    positions = np.arange(len(selected_rgb))
+
     # Ligne 1 : Points avec espacement normal
     y1 = 60
-    for i, rgb in enumerate(selected_rgb):
-        x = margin + i * spacing + RADIUS
-        color = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
-        draw.ellipse([x - RADIUS, y1 - RADIUS, x + RADIUS, y1 + RADIUS], fill=color)
+    xs = margin + positions * spacing + RADIUS
+    draw_disks(draw, xs, np.full_like(xs, y1), selected_rgb, RADIUS)
 
     # Ligne 2 : Points collés (sans espacement)
     y2 = 120
-    for i, rgb in enumerate(selected_rgb):
-        x = margin + i * (RADIUS * 2) + RADIUS
-        color = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
-        draw.ellipse([x - RADIUS, y2 - RADIUS, x + RADIUS, y2 + RADIUS], fill=color)
+    xs = margin + positions * (RADIUS * 2) + RADIUS
+    draw_disks(draw, xs, np.full_like(xs, y2), selected_rgb, RADIUS)
 
     # Texte
     draw.text((margin, 20), "Espacement normal (12px + 4px)", fill=(100, 100, 100))
     draw.text((margin, 85), "Points collés (diamètre 12px)", fill=(100, 100, 100))
-    draw.text((margin, 150), f"Delta RGB moyen entre voisins: {np.mean(deltas):.1f} (min: {min(deltas):.1f}, max: {max(deltas):.1f})", fill=(100, 100, 100))
+    draw.text((margin, 150), f"Delta RGB moyen entre voisins: {deltas.mean():.1f} (min: {deltas.min():.1f}, max: {deltas.max():.1f})", fill=(100, 100, 100))
 
     output_path = os.path.join(script_dir, "test_50_nuances_adjacentes.png")
     img.save(output_path)
@@ -6,9 +6,11 @@ But: vérifier si l'œil distingue les nuances adjacentes
 
 import numpy as np
 from PIL import Image, ImageDraw
-import colorsys
 import os
 
+from palette_cache import load_palette_colors
+from placement import draw_disks
+
 # Configuration identique à palette_crop
 RADIUS = 6
 GRID_SIZE = RADIUS * 2  # 12px entre chaque point
@@ -23,42 +25,55 @@ JAUNE_FILTER = {
 }
 
 
-def load_colors(file_path):
-    """Charge le fichier texte des couleurs (format CSV: R, G, B)"""
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+def filter_yellow(palette_colors):
+    """
+    Filtre les couleurs jaunes avec la même logique que palette_crop.
+    palette_colors = (p_rgb, h, s, v), base réduite issue de load_palette_colors :
+    réduction, dédoublonnage et HSV viennent du cache disque, il ne reste
+    que les seuils du filtre à appliquer.
+    """
+    p_rgb, h, s, v = palette_colors
 
+    cfg = JAUNE_FILTER
+    (hue_min, hue_max), = cfg["hue_ranges"]  # Une seule plage pour le jaune
 
-def filter_yellow(all_rgb):
-    """Filtre les couleurs jaunes avec la même logique que palette_crop"""
-    # Réduction pour nuances discriminables (seuil 2-bits) - identique au script
-    reduced = (all_rgb // 2) * 2
-    _, unique_indices = np.unique(reduced, axis=0, return_index=True)
-    p_rgb = all_rgb[unique_indices]
+    # Filtre hue d'abord (le plus sélectif), puis saturation et valeur sur
+    # les seules couleurs retenues
+    idx = np.flatnonzero((h >= hue_min) & (h <= hue_max))
+    s_idx = s[idx]
+    v_idx = v[idx]
+    idx = idx[(s_idx >= cfg["sat_min"]) & (s_idx <= cfg["sat_max"]) &
+              (v_idx >= cfg["val_min"]) & (v_idx <= cfg["val_max"])]
 
-    # Conversion RGB -> HSV
-    r_n = p_rgb[:, 0] / 255.0
-    g_n = p_rgb[:, 1] / 255.0
-    b_n = p_rgb[:, 2] / 255.0
-    h, s, v = np.vectorize(colorsys.rgb_to_hsv)(r_n, g_n, b_n)
+    filtered_rgb = p_rgb[idx]
+    filtered_h = h[idx]
+    filtered_s = s[idx]
+    filtered_v = v[idx]
 
-    cfg = JAUNE_FILTER
-
-    # Filtre hue
-    hue_mask = np.zeros(len(h), dtype=bool)
-    for hue_min, hue_max in cfg["hue_ranges"]:
-        hue_mask |= (h >= hue_min) & (h <= hue_max)
+    return filtered_rgb, filtered_h, filtered_s, filtered_v
 
-    sat_mask = (s >= cfg["sat_min"]) & (s <= cfg["sat_max"])
-    val_mask = (v >= cfg["val_min"]) & (v <= cfg["val_max"])
 
-    mask = hue_mask & sat_mask & val_mask
+def sorted_window(h, s, v, start, count):
+    """
+    Indices des couleurs aux rangs start à start + count de l'ordre
+    lexicographique (-v, s, h), sans trier toute la liste : même résultat que
+    np.lexsort((h, s, -v))[start:start + count].
+    Tri lexicographique plutôt qu'une clé pondérée -v*100 + s*10 + h, qui
+    laisse s et h déborder sur l'ordre des v voisins.
+    """
+    count = min(count, len(v) - start)
+    if count <= 0:
+        return np.empty(0, dtype=np.intp)
 
-    filtered_rgb = p_rgb[mask]
-    filtered_h = h[mask]
-    filtered_s = s[mask]
-    filtered_v = v[mask]
+    # np.partition situe en O(N) les valeurs de -v aux deux bords de la
+    # fenêtre ; seules les couleurs entre ces deux valeurs sont triées
+    neg_v = -v
+    low, high = np.partition(neg_v, [start, start + count - 1])[[start, start + count - 1]]
+    before = np.count_nonzero(neg_v < low)
 
-    return filtered_rgb, filtered_h, filtered_s, filtered_v
+    candidates = np.flatnonzero((neg_v >= low) & (neg_v <= high))
+    candidates = candidates[np.lexsort((h[candidates], s[candidates], neg_v[candidates]))]
+    return candidates[start - before:start - before + count]
 
 
 def main():
@@ -66,21 +81,18 @@ def main():
     data_file = os.path.join(script_dir, "COULEURS_EPSON_UNIQUE_1.6M.txt")
 
     print("Chargement des couleurs...")
-    all_rgb = load_colors(data_file)
-    print(f"Total couleurs chargées: {len(all_rgb)}")
+    palette_colors = load_palette_colors(data_file)
+    print(f"Nuances après réduction: {len(palette_colors[0])}")
 
     print("Filtrage des jaunes...")
-    yellow_rgb, yellow_h, yellow_s, yellow_v = filter_yellow(all_rgb)
+    yellow_rgb, yellow_h, yellow_s, yellow_v = filter_yellow(palette_colors)
     print(f"Nuances de jaune trouvées: {len(yellow_rgb)}")
 
     # Trier par luminosité (V) puis saturation (S) pour avoir des nuances adjacentes
     # C'est ainsi qu'elles sont ordonnées dans le nuage
-    sort_key = (-yellow_v * 100) + (yellow_s * 10) + (yellow_h * 1)
-    sorted_indices = np.argsort(sort_key)
-
     # Prendre 50 couleurs successives à partir du milieu du spectre
-    start_idx = len(sorted_indices) // 2
-    selected_indices = sorted_indices[start_idx:start_idx + 50]
+    start_idx = len(yellow_rgb) // 2
+    selected_indices = sorted_window(yellow_h, yellow_s, yellow_v, start_idx, 50)
     selected_rgb = yellow_rgb[selected_indices]
     selected_h = yellow_h[selected_indices]
     selected_s = yellow_s[selected_indices]
@@ -98,36 +110,31 @@ def main():
     img = Image.new('RGB', (width, height), (255, 255, 255))
     draw = ImageDraw.Draw(img)
 
-    # Dessiner les 50 points en ligne
+    # Dessiner les 50 points en ligne (même rastérisation que les nuages)
     y = margin + RADIUS
+    xs = margin + np.arange(len(selected_rgb)) * spacing + RADIUS
+    draw_disks(draw, xs, np.full_like(xs, y), selected_rgb, RADIUS)
 
-    for i, (rgb, h, s, v) in enumerate(zip(selected_rgb, selected_h, selected_s, selected_v)):
-        x = margin + i * spacing + RADIUS
-
-        color = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
-        draw.ellipse(
-            [x - RADIUS, y - RADIUS, x + RADIUS, y + RADIUS],
-            fill=color
-        )
-
-        # Afficher les valeurs pour les 10 premiers
-        if i < 10:
-            print(f"Point {i+1}: RGB({rgb[0]:3d}, {rgb[1]:3d}, {rgb[2]:3d}) | H={h:.4f} S={s:.4f} V={v:.4f}")
+    # Afficher les valeurs pour les 10 premiers (convertis une fois en
+    # int / float Python plutôt qu'en scalaires NumPy à chaque accès)
+    shown = (selected_rgb[:10].tolist(), selected_h[:10].tolist(),
+             selected_s[:10].tolist(), selected_v[:10].tolist())
+    for i, ((r, g, b), h, s, v) in enumerate(zip(*shown)):
+        print(f"Point {i+1}: RGB({r:3d}, {g:3d}, {b:3d}) | H={h:.4f} S={s:.4f} V={v:.4f}")
 
     print("...")
-    print(f"Point 50: RGB({selected_rgb[-1][0]:3d}, {selected_rgb[-1][1]:3d}, {selected_rgb[-1][2]:3d})")
+    r, g, b = selected_rgb[-1].tolist()
+    print(f"Point 50: RGB({r:3d}, {g:3d}, {b:3d})")
 
     # Calculer les écarts entre points adjacents
     print("\n" + "=" * 80)
     print("Écarts RGB entre points adjacents (Delta):")
-    deltas = []
-    for i in range(len(selected_rgb) - 1):
-        delta = np.sqrt(np.sum((selected_rgb[i].astype(float) - selected_rgb[i+1].astype(float))**2))
-        deltas.append(delta)
-
-    print(f"Delta min: {min(deltas):.2f}")
-    print(f"Delta max: {max(deltas):.2f}")
-    print(f"Delta moyen: {np.mean(deltas):.2f}")
+    diffs = np.diff(selected_rgb.astype(np.int32), axis=0)
+    deltas = np.sqrt(np.einsum('ij,ij->i', diffs, diffs))
+
+    print(f"Delta min: {deltas.min():.2f}")
+    print(f"Delta max: {deltas.max():.2f}")
+    print(f"Delta moyen: {deltas.mean():.2f}")
 
     # Sauvegarder
     output_path = os.path.join(script_dir, "test_50_nuances_jaune.png")
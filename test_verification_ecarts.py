@@ -4,55 +4,45 @@ Vérification des écarts réels dans la base de couleurs après réduction
 """
 
 import numpy as np
-import colorsys
+from scipy.spatial import cKDTree
 
-def load_colors(file_path):
-    return np.loadtxt(file_path, delimiter=',', skiprows=1, dtype=np.uint8)
+from palette_cache import load_palette_colors
 
-# Charger les couleurs
-print("Chargement...")
-all_rgb = load_colors("COULEURS_EPSON_UNIQUE_1.6M.txt")
-print(f"Total: {len(all_rgb)} couleurs")
-
-# Appliquer la MÊME réduction que palette_crop
-print("\nApplication de la réduction (all_rgb // 2) * 2...")
-reduced = (all_rgb // 2) * 2
-_, unique_indices = np.unique(reduced, axis=0, return_index=True)
-p_rgb = all_rgb[unique_indices]
+# Charger la base avec la MÊME réduction (all_rgb // 2) * 2 que palette_crop,
+# depuis le cache partagé avec les générateurs et les tests de nuances
+print("Chargement de la base réduite...")
+p_rgb = load_palette_colors("COULEURS_EPSON_UNIQUE_1.6M.txt")[0]
 print(f"Après réduction: {len(p_rgb)} couleurs uniques")
 
-# Calculer les écarts entre TOUTES les paires voisines (échantillon)
+# Calculer les écarts entre TOUTES les paires voisines
 print("\nRecherche des couleurs les plus proches dans la base réduite...")
 
-# Prendre un échantillon pour la recherche (trop long sinon)
-sample_size = 10000
-np.random.seed(42)
-sample_indices = np.random.choice(len(p_rgb), min(sample_size, len(p_rgb)), replace=False)
-sample = p_rgb[sample_indices].astype(float)
-
-# Trouver les paires les plus proches
-min_deltas = []
-min_delta_examples = []
-
-for i in range(min(1000, len(sample))):
-    # Distance à tous les autres points
-    diffs = sample - sample[i]
-    distances = np.sqrt(np.sum(diffs**2, axis=1))
-    distances[i] = float('inf')  # Ignorer soi-même
-
-    min_idx = np.argmin(distances)
-    min_dist = distances[min_idx]
-    min_deltas.append(min_dist)
-
-    if min_dist < 2.0:  # Exemple de couleurs très proches
-        min_delta_examples.append((sample[i], sample[min_idx], min_dist))
+# Plus proche voisin de chaque couleur via un k-d tree (O(N log N)) : plus
+# besoin d'échantillonner. k=2 car le premier voisin est la couleur elle-même
+colors = p_rgb.astype(float)
+tree = cKDTree(colors)
+distances, neighbors = tree.query(colors, k=2, workers=-1)
+min_deltas = distances[:, 1]
+min_indices = neighbors[:, 1]
+
+# Paires (i, plus proche voisin) à delta < 2.0, chacune comptée une fois :
+# deux couleurs mutuellement plus proches voisines forment une seule paire
+close_indices = np.flatnonzero(min_deltas < 2.0)
+close_pairs = np.sort(np.column_stack([close_indices, min_indices[close_indices]]), axis=1)
+close_pairs = np.unique(close_pairs, axis=0)
+
+# Exemples de paires très proches (seules les premières sont affichées)
+min_delta_examples = [
+    (colors[i], colors[j], np.sqrt(np.sum((colors[i] - colors[j]) ** 2)))
+    for i, j in close_pairs[:10]
+]
 
 print(f"\nStatistiques sur {len(min_deltas)} points:")
-print(f"  Delta minimum trouvé: {min(min_deltas):.2f}")
-print(f"  Delta maximum: {max(min_deltas):.2f}")
+print(f"  Delta minimum trouvé: {min_deltas.min():.2f}")
+print(f"  Delta maximum: {min_deltas.max():.2f}")
 print(f"  Delta moyen: {np.mean(min_deltas):.2f}")
 
-print(f"\nExemples de paires avec delta < 2.0: {len(min_delta_examples)}")
+print(f"\nPaires de plus proches voisins avec delta < 2.0: {len(close_pairs)}")
 for ex in min_delta_examples[:10]:
     c1, c2, d = ex
     print(f"  RGB({int(c1[0]):3d},{int(c1[1]):3d},{int(c1[2]):3d}) ↔ RGB({int(c2[0]):3d},{int(c2[1]):3d},{int(c2[2]):3d}) = Δ{d:.2f}")